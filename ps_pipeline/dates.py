@@ -0,0 +1,203 @@
+"""
+Date normalization shared by every stage. Parsed strings are memoized, and
+the format a source publishes its dates in is learned, so that its later
+dates take a strptime fast path instead of the generic parser.
+"""
+
+__author__ = "Johanan Tai"
+
+import re
+import functools
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+
+# Formats tried, in order, before falling back to dateutil
+KNOWN_FORMATS = (
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M:%S%z",
+    "%Y-%m-%d",
+    "%B %d, %Y",
+    "%b %d, %Y",
+    "%b. %d, %Y",
+    "%A, %B %d, %Y",
+    "%m/%d/%Y",
+    "%m/%d/%y",
+    "%m.%d.%Y",
+    "%m.%d.%y",
+    "%d %B %Y",
+    "%a, %d %b %Y %H:%M:%S %z",
+    "%a, %d %b %Y %H:%M:%S GMT",
+    "%a, %d %b %Y %H:%M:%S UTC",
+)
+
+# Formats spelling out the zone by name, which strptime leaves naive
+_UTC_FORMATS = {"%a, %d %b %Y %H:%M:%S GMT", "%a, %d %b %Y %H:%M:%S UTC"}
+
+# Marks the sources whose dates are ISO 8601
+_ISO = "iso"
+
+# Learned format of every source
+_source_formats: dict[str, str] = {}
+
+
+def source_of(url) -> str | None:
+    """Dates of the same website are expected to share a format"""
+    return (urlsplit(url).netloc or None) if url else None
+
+
+def _strptime(text, fmt) -> datetime:
+    if fmt == _ISO:
+        return datetime.fromisoformat(text)
+
+    parsed = datetime.strptime(text, fmt)
+    return parsed.replace(tzinfo=timezone.utc) if fmt in _UTC_FORMATS else parsed
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def _parse(text: str) -> tuple[datetime | None, str | None]:
+    """The datetime of the string and the format it was found in, if any"""
+
+    try:
+        return datetime.fromisoformat(text), _ISO
+    except ValueError:
+        pass
+
+    for fmt in KNOWN_FORMATS:
+        try:
+            return _strptime(text, fmt), fmt
+        except ValueError:
+            continue
+
+    # Imported on the first string no known format fits
+    from dateutil.parser import parse as datetimeparse
+
+    try:
+        return datetimeparse(text), None
+    except (ValueError, OverflowError):
+        return None, None
+
+
+def parse(text: str, source=None) -> datetime:
+    """
+    Drop-in for dateutil's parse, raising ValueError on unparsable strings.
+    A source is any key of where the string comes from, see source_of.
+    """
+
+    text = text.strip() if text else text
+    if not text:
+        raise ValueError(f"Empty datetime string: {text!r}")
+
+    learned = _source_formats.get(source)
+
+    if learned is not None:
+        try:
+            return _strptime(text, learned)
+        except ValueError:
+            pass
+
+    parsed, fmt = _parse(text)
+
+    if parsed is None:
+        raise ValueError(f"Unknown datetime string: {text!r}")
+
+    if source is not None and fmt is not None:
+        _source_formats[source] = fmt
+
+    return parsed
+
+
+def parse_or_none(text: str, source=None) -> datetime | None:
+    try:
+        return parse(text, source)
+    except ValueError:
+        return None
+
+
+def parse_many(texts, sources=None) -> list[datetime | None]:
+    """
+    Parses every distinct string of the batch once, None for unparsable ones.
+    Sources are given along with the strings, one for each, if at all.
+    """
+
+    texts = list(texts)
+    sources = [None] * len(texts) if sources is None else list(sources)
+
+    parsed = {}
+    for key in zip(texts, sources):
+        if key not in parsed:
+            parsed[key] = parse_or_none(*key)
+
+    return [parsed[key] for key in zip(texts, sources)]
+
+
+def comparable(*datetimes: datetime) -> tuple[datetime, ...]:
+    """
+    The datetimes as they can be compared with one another. Sources publish
+    both naive and aware datetimes, which cannot be compared, so once they are
+    mixed the wall-clock time of every datetime is compared.
+    """
+
+    if len({d.tzinfo is None for d in datetimes}) > 1:
+        return tuple(d.replace(tzinfo=None) for d in datetimes)
+    return datetimes
+
+
+# Dates embedded in text, by order of preference. The separators are / | .
+_EMBEDDED_FORMATS = {
+    "mdY": r"(?P<mdY_m>\d{2})[\/|.](?P<mdY_d>\d{2})[\/|.](?P<mdY_Y>\d{4})",
+    "mdy": r"(?P<mdy_m>\d{2})[\/|.](?P<mdy_d>\d{2})[\/|.](?P<mdy_y>\d{2})",
+    "BdY": (
+        r"(?P<BdY_B>[A-Za-z]{4,})\s+(?P<BdY_d>\d{2})(?:,\s*|\s+)(?P<BdY_Y>\d{4})"
+    ),
+    "bdY": (
+        r"(?P<bdY_b>[A-Za-z]{3})\s+(?P<bdY_d>\d{2})(?:,\s*|\s+)(?P<bdY_Y>\d{4})"
+    ),
+}
+
+_ISO_PATTERN = re.compile(
+    r"^\d{4}-\d{2}-\d{2}(?:T\d{2}:\d{2}:\d{2}(?:[\-\+]\d{2}:\d{2}|Z)?)?$"
+)
+_EMBEDDED_PATTERN = re.compile(
+    "|".join(f"(?P<{kind}>{regex})" for kind, regex in _EMBEDDED_FORMATS.items())
+)
+
+
+def find_date(text):
+    """
+    Returns the first date found within the text as a datetime string, or the
+    text itself if there is none. The text is scanned once for every format.
+
+    No stage calls it, it is kept for scripts and notebooks that imported
+    transform.pipe.transform_date.
+    """
+
+    if _ISO_PATTERN.fullmatch(text):
+        return str(datetime.fromisoformat(text))
+
+    first_matches = {}
+    for match in _EMBEDDED_PATTERN.finditer(text):
+        first_matches.setdefault(match.lastgroup, match)
+
+    for kind in _EMBEDDED_FORMATS:
+        match = first_matches.get(kind)
+        if match is None:
+            continue
+
+        # Group names are the kind and the strptime directive, e.g. mdY_m
+        directives = [
+            (name.rpartition("_")[-1], value)
+            for name, value in match.groupdict().items()
+            if name.startswith(f"{kind}_") and value
+        ]
+        try:
+            return str(
+                datetime.strptime(
+                    " ".join(value for _, value in directives),
+                    " ".join(f"%{d}" for d, _ in directives),
+                )
+            )
+        except ValueError:
+            continue
+
+    return text
@@ -5,14 +5,15 @@ Main module that executes the extraction pipeline on command.
 __author__ = "Johanan Tai"
 
 import os
-import json
 import argparse
 from pathlib import Path
 
 from dotenv import load_dotenv
 from importlib import import_module
 
-from ps_pipeline.json_model import Articles
+from ps_pipeline.json_model import Article, Articles, json_files, read_json
+from ps_pipeline.json_reader import JSONArrayReader
+from ps_pipeline.store import open_store
 
 
 SOURCE = {
@@ -38,8 +39,9 @@ SOURCE = {
     },
     "70114": {
         "url": "https://aguilar.house.gov/category/congress_press_release/",
+        "feed": "https://aguilar.house.gov/category/congress_press_release/feed/",
         "parser": "soup_10",
-        "scraper": "sel_1",
+        "scraper": "sel_4",
     },
     "28918": {
         "url": "https://www.speaker.gov/news/",
@@ -128,8 +130,9 @@ SOURCE = {
     },
     "53358": {
         "url": "https://www.murray.senate.gov/category/press-releases/",
+        "feed": "https://www.murray.senate.gov/category/press-releases/feed/",
         "parser": "soup_5",
-        "scraper": "sel_1",
+        "scraper": "sel_4",
     },
     "135720": {
         "url": "https://www.daines.senate.gov/news/press-releases/",
@@ -191,6 +194,43 @@ def extract_from_files(web_parser, html_path):
     return articles_extracted
 
 
+def extract_from_cache(web_parser, http_cache):
+    from tqdm import tqdm
+    from ps_pipeline.extract.web.http_cache import ARTICLE
+
+    articles_extracted = []
+
+    # Listing pages and feeds are cached along with the articles
+    for url in tqdm(list(http_cache.urls(ARTICLE))):
+        page_source = http_cache.body(url)
+
+        if page_source is None:
+            continue
+
+        article = web_parser.ArticleSoup(page_source).extract()
+
+        if article.get("title") and article.get("raw_text"):
+            articles_extracted.append(article)
+
+    return articles_extracted
+
+
+def import_extract_files(store, candidate_id, extract_files) -> int:
+    """
+    Imports the extract files of a candidate into an empty store, e.g. one set
+    up for an existing data directory, oldest file first so that the newest
+    version of every article wins. Returns the number of articles imported.
+    """
+
+    if store.has_articles(candidate_id):
+        return 0
+
+    return sum(
+        store.upsert_articles(candidate_id, JSONArrayReader(file, Article))
+        for file in extract_files
+    )
+
+
 def main():
 
     load_dotenv()
@@ -211,6 +251,13 @@ def main():
         help="Extract from HTML files",
     )
 
+    parser.add_argument(
+        "-hc",
+        "--extract_from_cache",
+        action="store_true",
+        help="Extract from the HTTP cache without going online",
+    )
+
     parser.add_argument(
         "-ce",
         "--compare",
@@ -228,33 +275,79 @@ def main():
     data_directory = Path(os.getenv("DATA_FILES_DIRECTORY"))
     html_path = data_directory / args.candidate_id / "HTML_FILES"
     extract_path = data_directory / args.candidate_id / "EXTRACT_FILES"
+    retry_path = data_directory / args.candidate_id / "RETRY_FILES" / "dead_letter.json"
+    cache_path = data_directory / args.candidate_id / "HTTP_CACHE"
+
+    store = open_store()
 
     webparser = import_module(
         f"ps_pipeline.extract.web.parser.{candidate_source.get('parser')}"
     )
 
-    if not args.extract_from_files:
+    if args.extract_from_cache:
+        from ps_pipeline.extract.web.http_cache import HTTPCache
+
+        http_cache = HTTPCache(cache_path, offline=True)
+        articles_extracted = extract_from_cache(webparser, http_cache)
+
+    elif not args.extract_from_files:
+        from ps_pipeline.extract.web.retry import RetryQueue
+        from ps_pipeline.extract.web.http_cache import HTTPCache
+
         webscraper = import_module(
             f"ps_pipeline.extract.web.scraper.{candidate_source.get('scraper')}"
         )
-        extract_files = filter(
-            lambda f: f.name.endswith(".json"), extract_path.iterdir()
-        )
+        extract_files = json_files(extract_path)
 
         latest_list = []
+        collected_urls = set()
 
-        if args.compare:
+        if args.compare and store is not None:
+            # Extract files collected before the store was set up are imported once
+            imported = import_extract_files(store, args.candidate_id, extract_files)
+            if imported:
+                print(f"{imported} articles imported from the extract files")
+
+            # The store answers with indexed queries, instead of reading every file
+            latest = store.latest(args.candidate_id)
+            if latest is not None:
+                latest_list.append(latest)
+            collected_urls = store.urls(args.candidate_id)
+
+        elif args.compare:
             for file in extract_files:
-                with open(file, "r") as f:
-                    latest_list.append(Articles(json.load(f)).latest)
+                articles = Articles(read_json(file))
+
+                if articles.latest is not None:
+                    latest_list.append(articles.latest)
+                collected_urls.update(articles.urls)
+
+        # Sources with a feed or sitemap only visit the articles not collected yet
+        discovery = (
+            {"feed_url": candidate_source.get("feed"), "collected_urls": collected_urls}
+            if candidate_source.get("feed")
+            else {}
+        )
+
+        # Pages that could not be loaded in the last run are retried first
+        retry_queue = RetryQueue.load(retry_path)
+        http_cache = HTTPCache(cache_path)
 
         articles_extracted = webscraper.scrape(
             candidate_source.get("url"),
             webparser,
             html_path,
             max(latest_list) if latest_list else None,
+            retry_queue=retry_queue,
+            http_cache=http_cache,
+            **discovery,
         )
 
+        retry_queue.save(retry_path)
+
+        for k, v in http_cache.stats.items():
+            print(f"HTTP cache {k}:", v)
+
     else:
         if not html_path.exists():
             print("Could not find HTML files to extract")
@@ -264,9 +357,16 @@ def main():
 
     articles_json = Articles(articles_extracted)
     articles_json.save(
-        filename=candidate_source.get("parser"), export_path=extract_path
+        filename=candidate_source.get("parser"),
+        export_path=extract_path,
+        compact=True,
+        compression=os.getenv("JSON_COMPRESSION"),
     )
 
+    if store is not None:
+        store.upsert_articles(args.candidate_id, articles_json.all)
+        store.close()
+
 
 if __name__ == "__main__":
     main()
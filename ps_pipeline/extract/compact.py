@@ -0,0 +1,183 @@
+"""
+Compacts the extract files of a candidate into one segment, keeping only the
+newest version of every article, and archives the files it replaces.
+
+    python -m ps_pipeline.extract.compact -c <candidate_id>
+"""
+
+__author__ = "Johanan Tai"
+
+import os
+import shutil
+import hashlib
+import tempfile
+import argparse
+from pathlib import Path
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from ps_pipeline.dates import comparable, parse_many, source_of
+from ps_pipeline.json_model import Article, dump_stream, json_files, loads, open_json
+from ps_pipeline.json_reader import JSONArrayReader
+
+
+def _content_hash(element) -> str | None:
+    text = element.get("raw_text")
+    return hashlib.sha1(text.encode("utf-8")).hexdigest() if text else None
+
+
+def _seekable(file: Path):
+    """
+    A handle that seeks cheaply both ways. Compressed files are spooled to an
+    anonymous temporary file, as decompression streams only seek forward or
+    decompress again from the start.
+    """
+
+    if file.name.endswith(".json"):
+        return open(file, "rb")
+
+    spooled = tempfile.TemporaryFile()
+    with open_json(file) as f:
+        shutil.copyfileobj(f, spooled)
+    spooled.seek(0)
+
+    return spooled
+
+
+def compact(extract_path: Path, archive=True, compression=None) -> dict:
+    """
+    Merges the extract files in two streaming passes, so that only the byte
+    span of every article is held in memory, never the articles themselves.
+
+    Articles are deduplicated by url, where the one of the most recent file
+    wins, and written newest first.
+    """
+
+    extract_files = json_files(extract_path)
+
+    stats = {"files": len(extract_files), "read": 0, "changed": 0, "written": 0}
+
+    if len(extract_files) < 2:
+        return stats
+
+    # url -> (file index, start byte, end byte, publish time, content hash)
+    newest = {}
+
+    for i, file in enumerate(extract_files):
+        for start, stop, element in JSONArrayReader(file, Article)._iter_raw():
+            stats["read"] += 1
+
+            # Articles without a url cannot be told apart, so all of them are kept
+            url = element.get("source_url") or (i, start)
+            content_hash = _content_hash(element)
+
+            if url in newest and newest[url][-1] != content_hash:
+                stats["changed"] += 1
+
+            newest[url] = (i, start, stop, element.get("publish_time"), content_hash)
+
+    spans = list(newest.values())
+    # Publish times are parsed in one batch, with the articles without one last
+    published = parse_many(
+        (span[3] for span in spans),
+        (source_of(url) if isinstance(url, str) else None for url in newest),
+    )
+    sort_keys = comparable(*(t if t is not None else datetime.min for t in published))
+    spans = [
+        span
+        for _, span in sorted(
+            zip(sort_keys, spans), key=lambda keyed: keyed[0], reverse=True
+        )
+    ]
+
+    def read_spans(handles):
+        for i, start, stop, _, _ in spans:
+            handles[i].seek(start)
+            yield loads(handles[i].read(stop - start))
+
+    prefix = extract_files[-1].name.rpartition("Articles_")[0]
+    timestamp = datetime.strftime(datetime.now(), "%Y-%m-%d-%H%M%S-%f")
+    suffix = f".json.{compression}" if compression else ".json"
+    compacted_path = extract_path / f"{prefix}Articles_{timestamp}{suffix}"
+    # The partial file is not picked up by readers, as it does not end in .json
+    partial_path = compacted_path.with_name(compacted_path.name + ".partial")
+
+    handles = []
+
+    try:
+        # Spans are read in publish order, so every handle seeks back and forth
+        for file in extract_files:
+            handles.append(_seekable(file))
+
+        with open_json(partial_path, "wb", compression) as f:
+            dump_stream(read_spans(handles), f, indent=False)
+
+    except BaseException:
+        partial_path.unlink(missing_ok=True)
+        raise
+
+    finally:
+        for handle in handles:
+            handle.close()
+
+    partial_path.replace(compacted_path)
+    stats["written"] = len(spans)
+
+    archive_path = extract_path / "ARCHIVE"
+    if archive:
+        archive_path.mkdir(exist_ok=True)
+
+    for file in extract_files:
+        index_file = file.with_name(file.name + ".idx")
+        index_file.unlink(missing_ok=True)
+
+        if archive:
+            shutil.move(file, archive_path / file.name)
+        else:
+            file.unlink()
+
+    return stats
+
+
+def main():
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(prog="ps_pipeline_compact")
+
+    parser.add_argument(
+        "-c",
+        "--candidate_id",
+        required=True,
+        help="Candidate ID",
+    )
+
+    parser.add_argument(
+        "-d",
+        "--delete",
+        action="store_true",
+        help="Delete the compacted files instead of archiving them",
+    )
+
+    args = parser.parse_args()
+
+    data_directory = Path(os.getenv("DATA_FILES_DIRECTORY"))
+    extract_path = data_directory / args.candidate_id / "EXTRACT_FILES"
+
+    if not extract_path.exists():
+        print("Could not find extract files to compact")
+        exit()
+
+    stats = compact(
+        extract_path,
+        archive=not args.delete,
+        compression=os.getenv("JSON_COMPRESSION"),
+    )
+
+    for k, v in stats.items():
+        print(f"Compaction {k}:", v)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,18 +4,19 @@ General logic for the extraction pipeline combining parser and scraper.
 
 __author__ = "Johanan Tai"
 
-import json
 from tqdm import tqdm
 
-from ps_pipeline.json_model import Articles
+from ps_pipeline.json_model import Articles, read_json
 
 
 def get_latest_article(extract_files):
     latest_list = []
 
     for file in extract_files:
-        with open(file, "r") as f:
-            latest_list.append(Articles(json.load(f)).latest)
+        latest = Articles(read_json(file)).latest
+
+        if latest is not None:
+            latest_list.append(latest)
 
     return max(latest_list) if latest_list else None
 
@@ -30,6 +31,8 @@ def webscrape(web_parser, web_scraper, **kwargs) -> list[dict[str, str]]:
         web_parser,
         kwargs.get("html_path"),
         last_collected,
+        retry_queue=kwargs.get("retry_queue"),
+        http_cache=kwargs.get("http_cache"),
     )
 
     return articles_extracted
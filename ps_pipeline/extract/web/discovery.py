@@ -0,0 +1,167 @@
+"""
+Discovers article urls from RSS/Atom feeds and XML sitemaps, instead of
+iterating through the listing pages of a website.
+"""
+
+__author__ = "Johanan Tai"
+
+import io
+from xml.etree.ElementTree import iterparse
+from urllib.error import HTTPError
+from urllib.parse import urlparse, urlencode, parse_qsl
+from urllib.request import Request, urlopen
+
+from ps_pipeline.dates import comparable, parse_or_none
+from ps_pipeline.extract.web.http_cache import USER_AGENT
+
+
+def fetch_xml(url, timeout=10):
+    request = Request(url, headers={"User-Agent": USER_AGENT})
+    with urlopen(request, timeout=timeout) as response:
+        charset = response.headers.get_content_charset() or "utf-8"
+        return response.read().decode(charset, errors="replace")
+
+
+def _tag(element):
+    # Drops the namespace, e.g. {http://www.w3.org/2005/Atom}entry -> entry
+    return element.tag.rpartition("}")[-1]
+
+
+def _child_text(element, *names):
+    for child in element:
+        if _tag(child) in names and child.text:
+            return child.text.strip()
+    return None
+
+
+def iter_entries(xml_text):
+    """
+    Streams through a feed or sitemap, yielding (kind, url, published) where
+    kind is 'entry' for the articles of a feed, 'url' for the ones of a sitemap,
+    or 'sitemap' for sitemaps listed in a sitemap index.
+    """
+
+    for _, element in iterparse(io.BytesIO(xml_text.encode("utf-8")), ("end",)):
+        tag = _tag(element)
+
+        # RSS
+        if tag == "item":
+            yield (
+                "entry",
+                _child_text(element, "link"),
+                parse_or_none(_child_text(element, "pubDate", "date")),
+            )
+
+        # Atom
+        elif tag == "entry":
+            links = [
+                child.get("href")
+                for child in element
+                if _tag(child) == "link"
+                and child.get("rel", "alternate") == "alternate"
+            ]
+            yield (
+                "entry",
+                links[0] if links else None,
+                parse_or_none(_child_text(element, "published", "updated")),
+            )
+
+        # Sitemap and sitemap index
+        elif tag in ("url", "sitemap"):
+            yield (
+                tag,
+                _child_text(element, "loc"),
+                parse_or_none(_child_text(element, "lastmod")),
+            )
+
+        else:
+            continue
+
+        # Entries are done with once yielded, which keeps the memory flat
+        element.clear()
+
+
+def _is_older(published, last_collected):
+    if published is None or last_collected is None:
+        return False
+
+    published, last_collected = comparable(published, last_collected)
+    return published < last_collected
+
+
+def page_url(feed_url, page, page_param="paged"):
+    """The url of a page of a feed, e.g. ?paged=2 for WordPress feeds"""
+
+    parsed = urlparse(feed_url)
+    query = [(k, v) for k, v in parse_qsl(parsed.query) if k != page_param]
+    return parsed._replace(query=urlencode(query + [(page_param, page)])).geturl()
+
+
+def discover(
+    feed_url,
+    collected_urls=None,
+    last_collected=None,
+    fetch=fetch_xml,
+    page_param="paged",
+):
+    """
+    Returns the article urls of a feed or sitemap that have not been collected.
+
+    Sitemaps of a sitemap index that were last modified before last_collected
+    are not fetched.
+
+    Feeds only list their latest entries, so they are paged through until an
+    entry that was already collected shows up, a page has nothing new or there
+    are no more pages.
+    """
+
+    collected_urls = collected_urls or set()
+
+    new_urls = []
+    seen_urls = set(collected_urls)
+    # (url, url of the first page, page number)
+    to_visit = [(feed_url, feed_url, 1)]
+    visited = set()
+
+    while to_visit:
+        url, first_page, page = to_visit.pop(0)
+
+        if url in visited:
+            continue
+        visited.add(url)
+
+        try:
+            entries = list(iter_entries(fetch(url)))
+        except HTTPError as e:
+            # Past the last page of a feed
+            if page > 1 and e.code == 404:
+                continue
+            raise
+
+        reached_collected = False
+        found_new = False
+
+        for kind, entry_url, published in entries:
+            if not entry_url:
+                continue
+
+            if kind == "sitemap":
+                if not _is_older(published, last_collected):
+                    to_visit.append((entry_url, entry_url, 1))
+                continue
+
+            if entry_url in collected_urls:
+                reached_collected = True
+
+            if entry_url not in seen_urls:
+                seen_urls.add(entry_url)
+                new_urls.append(entry_url)
+                found_new = True
+
+        is_feed = any(kind == "entry" for kind, _, _ in entries)
+
+        if is_feed and found_new and not reached_collected:
+            next_page = page_url(first_page, page + 1, page_param)
+            to_visit.append((next_page, first_page, page + 1))
+
+    return new_urls
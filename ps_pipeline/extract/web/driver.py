@@ -0,0 +1,135 @@
+"""
+Shared factory for the WebDrivers used by the scraper modules.
+"""
+
+__author__ = "Johanan Tai"
+
+import os
+
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.wait import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+
+from ps_pipeline.extract.web.http_cache import ARTICLE
+
+
+# Only the page source is read by the parsers, anything else is thrown away
+BLOCKED_URLS = [
+    # Images
+    "*.png",
+    "*.jpg",
+    "*.jpeg",
+    "*.gif",
+    "*.webp",
+    "*.svg",
+    "*.ico",
+    # Fonts
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.otf",
+    # Media
+    "*.mp4",
+    "*.webm",
+    "*.mp3",
+    "*youtube.com/embed*",
+    "*player.vimeo.com*",
+    # Analytics and trackers
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*facebook.net*",
+    "*connect.facebook.com*",
+    "*platform.twitter.com*",
+    "*hotjar.com*",
+    "*addthis.com*",
+    "*sharethis.com*",
+]
+
+
+def create_chrome_driver(
+    page_load_strategy=None,
+    page_load_timeout=None,
+    script_timeout=None,
+    block_resources=True,
+):
+    """
+    Starts a headless Chrome driver that only waits for the DOM to be parsed,
+    without loading images, media and trackers.
+
+    Unset arguments are read from the environment, see .env.sample.
+    """
+
+    page_load_strategy = page_load_strategy or os.getenv(
+        "SCRAPER_PAGE_LOAD_STRATEGY", "eager"
+    )
+    page_load_timeout = page_load_timeout or float(
+        os.getenv("SCRAPER_PAGE_LOAD_TIMEOUT", 30)
+    )
+    script_timeout = script_timeout or float(os.getenv("SCRAPER_SCRIPT_TIMEOUT", 10))
+
+    chrome_service = Service()
+    chrome_options = Options()
+    chrome_options.add_argument("incognito")
+    chrome_options.add_argument("headless")
+    chrome_options.page_load_strategy = page_load_strategy
+
+    if block_resources:
+        chrome_options.add_argument("blink-settings=imagesEnabled=false")
+        chrome_options.add_experimental_option(
+            "prefs", {"profile.managed_default_content_settings.images": 2}
+        )
+
+    driver = webdriver.Chrome(service=chrome_service, options=chrome_options)
+    driver.set_page_load_timeout(page_load_timeout)
+    driver.set_script_timeout(script_timeout)
+
+    if block_resources:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URLS})
+
+    return driver
+
+
+def wait_for(driver, css_selector, timeout=None):
+    """Waits until the element is present, returns False if it never shows up"""
+
+    timeout = timeout or float(os.getenv("SCRAPER_WAIT_TIMEOUT", 10))
+
+    try:
+        WebDriverWait(driver, timeout).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, css_selector))
+        )
+        return True
+    except TimeoutException:
+        return False
+
+
+def get_page_source(driver, url, css_selector=None, http_cache=None, kind=ARTICLE):
+    """
+    Loads the url and returns the page source. As the page load strategy does
+    not wait for the full page, the content container is explicitly waited for.
+
+    With an HTTP cache, pages that have not changed since they were cached are
+    served from the cache without being loaded by the driver. The kind of the
+    page, an article or a listing, is cached along with it.
+    """
+
+    if http_cache is not None:
+        cached_source, validators = http_cache.revalidate(url)
+        if cached_source is not None:
+            return cached_source
+
+    driver.get(url)
+
+    if css_selector:
+        wait_for(driver, css_selector)
+
+    if http_cache is not None and not http_cache.offline:
+        http_cache.store(url, driver.page_source, validators, kind)
+
+    return driver.page_source
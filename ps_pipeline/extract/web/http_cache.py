@@ -0,0 +1,207 @@
+"""
+Local HTTP cache storing page bodies with their ETag/Last-Modified validators,
+so unchanged pages are revalidated with a conditional request instead of reloaded.
+"""
+
+__author__ = "Johanan Tai"
+
+import json
+import hashlib
+from pathlib import Path
+from datetime import datetime
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError, URLError
+
+
+USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+)
+
+# Kinds of the cached pages, of which only articles are parsed as such
+ARTICLE = "article"
+LISTING = "listing"
+FEED = "feed"
+
+
+class HTTPCache:
+
+    def __init__(self, cache_path: Path, offline=False, timeout=10):
+        self.cache_path = cache_path
+        self.offline = offline
+        self.timeout = timeout
+
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "stored": 0,
+            "errors": 0,
+        }
+
+    def _filepath(self, url, suffix):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return self.cache_path / f"{key}{suffix}"
+
+    def entry(self, url):
+        """Returns the validators and metadata of a cached url"""
+
+        filepath = self._filepath(url, ".json")
+        if not filepath.exists():
+            return None
+
+        with open(filepath, "r") as f:
+            return json.load(f)
+
+    def body(self, url):
+        filepath = self._filepath(url, ".html")
+        if not filepath.exists():
+            return None
+
+        with open(filepath, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def store(self, url, body, validators=None, kind=ARTICLE):
+        self.cache_path.mkdir(exist_ok=True)
+
+        with open(self._filepath(url, ".html"), "w", encoding="utf-8") as f:
+            f.write(body)
+
+        with open(self._filepath(url, ".json"), "w") as f:
+            json.dump(
+                {
+                    "url": url,
+                    "kind": kind,
+                    "etag": (validators or {}).get("etag"),
+                    "last_modified": (validators or {}).get("last_modified"),
+                    "fetched_at": datetime.now().isoformat(),
+                },
+                f,
+                indent=4,
+            )
+
+        self.stats["stored"] += 1
+
+    def _request(self, url, method, entry=None):
+        headers = {"User-Agent": USER_AGENT}
+
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        request = Request(url, headers=headers, method=method)
+        return urlopen(request, timeout=self.timeout)
+
+    @staticmethod
+    def _validators(response):
+        return {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+
+    @staticmethod
+    def _has_validators(validators) -> bool:
+        return bool(validators and (validators["etag"] or validators["last_modified"]))
+
+    @staticmethod
+    def _unchanged(entry, validators) -> bool:
+        # Some servers answer a conditional HEAD with a 200 and the same validators
+        if validators["etag"]:
+            return validators["etag"] == entry.get("etag")
+        return bool(validators["last_modified"]) and (
+            validators["last_modified"] == entry.get("last_modified")
+        )
+
+    def revalidate(self, url):
+        """
+        Sends a HEAD request for the url, conditional when it is cached.
+
+        Returns (cached body, None) when the page has not changed, otherwise
+        (None, validators) to be stored along with the freshly loaded body.
+        Pages cached without validators cannot be revalidated, and are loaded
+        again without a request.
+        """
+
+        entry = self.entry(url)
+
+        if self.offline:
+            body = self.body(url)
+            self.stats["hits" if body is not None else "misses"] += 1
+            return body, None
+
+        if entry is not None and not self._has_validators(entry):
+            self.stats["misses"] += 1
+            return None, None
+
+        try:
+            with self._request(url, "HEAD", entry) as response:
+                validators = self._validators(response)
+
+            if entry is not None and self._unchanged(entry, validators):
+                body = self.body(url)
+                if body is not None:
+                    self.stats["hits"] += 1
+                    return body, None
+
+        except HTTPError as e:
+            if e.code == 304 and entry is not None:
+                body = self.body(url)
+                if body is not None:
+                    self.stats["hits"] += 1
+                    return body, None
+
+            validators = None
+            self.stats["errors"] += 1
+
+        except (URLError, TimeoutError):
+            validators = None
+            self.stats["errors"] += 1
+
+        self.stats["misses"] += 1
+        return None, validators
+
+    def fetch(self, url, kind=ARTICLE):
+        """Conditional GET of the url, reusing the cached body on a 304"""
+
+        entry = self.entry(url)
+
+        if self.offline:
+            body = self.body(url)
+            self.stats["hits" if body is not None else "misses"] += 1
+            return body
+
+        try:
+            with self._request(url, "GET", entry) as response:
+                charset = response.headers.get_content_charset() or "utf-8"
+                body = response.read().decode(charset, errors="replace")
+                validators = self._validators(response)
+
+        except HTTPError as e:
+            if e.code == 304 and entry is not None:
+                body = self.body(url)
+                if body is not None:
+                    self.stats["hits"] += 1
+                    return body
+            raise
+
+        self.stats["misses"] += 1
+        self.store(url, body, validators, kind)
+        return body
+
+    def urls(self, kind=None):
+        """
+        Iterates over every url stored in the cache, or only the ones of a kind.
+        Entries cached before their kind was recorded have none.
+        """
+
+        if not self.cache_path.exists():
+            return
+
+        for filepath in sorted(
+            self.cache_path.glob("*.json"), key=lambda f: f.stat().st_mtime
+        ):
+            with open(filepath, "r") as f:
+                entry = json.load(f)
+
+            if kind is None or entry.get("kind") == kind:
+                yield entry.get("url")
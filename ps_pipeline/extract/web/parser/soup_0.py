@@ -15,6 +15,10 @@ from ps_pipeline.extract.web.soup_model import (
     remove_formatting,
 )
 
+# CSS selectors of the containers waited for by the WebDriver
+LISTING_CONTENT = "a.news-item__title"
+ARTICLE_CONTENT = "section.body-content"
+
 
 def get_page_urls(page_source, url):
     soup = BeautifulSoup(page_source, "html.parser")
@@ -13,6 +13,10 @@ from ps_pipeline.extract.web.soup_model import (
     remove_formatting,
 )
 
+# CSS selectors of the containers waited for by the WebDriver
+LISTING_CONTENT = ".ArticleBlock__title, .ArticleBlock__titleContainer"
+ARTICLE_CONTENT = "div.RawHTML"
+
 
 def get_page_urls(page_source, url):
     soup = BeautifulSoup(page_source, "html.parser")
@@ -15,6 +15,10 @@ from ps_pipeline.extract.web.soup_model import (
     remove_formatting,
 )
 
+# CSS selectors of the containers waited for by the WebDriver
+LISTING_CONTENT = "article.elementor-post"
+ARTICLE_CONTENT = "div[data-widget_type='theme-post-content.default']"
+
 
 def get_page_urls(page_source, url):
 
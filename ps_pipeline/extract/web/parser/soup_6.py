@@ -16,6 +16,10 @@ from ps_pipeline.extract.web.soup_model import (
 
 URL_QUERY = "?Page="
 
+# CSS selectors of the containers waited for by the WebDriver
+LISTING_CONTENT = ".newsie-titler"
+ARTICLE_CONTENT = "div.newsbody"
+
 
 def get_article_urls(page_source, url):
     soup = BeautifulSoup(page_source, "html.parser")
@@ -16,6 +16,10 @@ from ps_pipeline.extract.web.soup_model import (
 
 URL_QUERY = "?page="
 
+# CSS selectors of the containers waited for by the WebDriver
+LISTING_CONTENT = "div.media-body"
+ARTICLE_CONTENT = "div.evo-article__body, div.evo-press-release__body, div.evo-in-the-news__body"
+
 
 def get_article_urls(page_source, url):
     soup = BeautifulSoup(page_source, "html.parser")
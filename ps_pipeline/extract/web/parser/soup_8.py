@@ -16,6 +16,10 @@ from ps_pipeline.extract.web.soup_model import (
     unwrap_grandchild,
 )
 
+# CSS selectors of the containers waited for by the WebDriver
+LISTING_CONTENT = "h1.title"
+ARTICLE_CONTENT = "div.post-content"
+
 
 def get_page_urls(page_source, url):
 
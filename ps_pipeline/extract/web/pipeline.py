@@ -0,0 +1,196 @@
+"""
+Pipelined scraping, where listing pages are iterated ahead of the article fetches.
+
+    listing thread --(article urls)--> article threads --(soups)--> calling thread
+
+The listing thread fills a bounded queue of article urls, so it is held back
+once it gets too far ahead. Every article thread fetches and parses with its
+own WebDriver, and the calling thread saves the parsed articles. Once an
+article at or before last_collected is found, every stage stops.
+"""
+
+__author__ = "Johanan Tai"
+
+import queue
+import threading
+
+from selenium.common.exceptions import WebDriverException
+
+from ps_pipeline.dates import comparable, parse as datetimeparse, source_of
+from ps_pipeline.extract.web.retry import RetryQueue, ARTICLE, LISTING
+
+
+# Messages passed from the threads to the calling thread
+_ARTICLE = "article"
+_ERROR = "error"
+_FAILED = "failed"
+_DONE = "done"
+
+
+def _put(q: queue.Queue, item, stop: threading.Event):
+    """Blocks while the queue is full, unless the pipeline has been stopped"""
+
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+
+    return False
+
+
+def _listing_worker(listing, url_queue, output_queue, stop, workers):
+
+    def report_error(url, error):
+        output_queue.put((_ERROR, (url, LISTING, error)))
+
+    try:
+        for article_urls in listing(report_error):
+            for url in article_urls:
+                if not _put(url_queue, url, stop):
+                    return
+            if stop.is_set():
+                return
+
+    except WebDriverException as e:
+        output_queue.put((_ERROR, (None, LISTING, e)))
+
+    except BaseException as e:
+        # Raised again by the calling thread, once every thread has stopped
+        output_queue.put((_FAILED, e))
+        stop.set()
+
+    finally:
+        # One sentinel per article thread, which does not block if stopped
+        for _ in range(workers):
+            while True:
+                try:
+                    url_queue.put(None, timeout=0.5)
+                    break
+                except queue.Full:
+                    if stop.is_set():
+                        _clear(url_queue)
+
+        output_queue.put((_DONE, None))
+
+
+def _article_worker(
+    driver, fetch_article, url_queue, output_queue, stop, last_collected
+):
+
+    try:
+        while True:
+            url = url_queue.get()
+
+            if url is None:
+                return
+            if stop.is_set():
+                continue
+
+            try:
+                article_soup = fetch_article(driver, url)
+            except WebDriverException as e:
+                output_queue.put((_ERROR, (url, ARTICLE, e)))
+                continue
+
+            # Stop collecting if the current article datetime is older or equal to
+            # the last collected datetime
+            if last_collected and article_soup.timestamp:
+                published, last = comparable(
+                    datetimeparse(article_soup.timestamp, source_of(article_soup.url)),
+                    last_collected,
+                )
+                if published <= last:
+                    stop.set()
+                    continue
+
+            output_queue.put((_ARTICLE, article_soup))
+
+    except BaseException as e:
+        output_queue.put((_FAILED, e))
+        stop.set()
+
+    finally:
+        output_queue.put((_DONE, None))
+
+
+def _clear(q: queue.Queue):
+    while True:
+        try:
+            q.get_nowait()
+        except queue.Empty:
+            return
+
+
+def pipelined_scrape(
+    listing,
+    fetch_article,
+    save_article,
+    drivers,
+    retry_queue: RetryQueue,
+    last_collected=None,
+    queue_size=20,
+):
+    """
+    listing:        callable(report_error) yielding lists of article urls,
+                    runs on the listing thread
+    fetch_article:  callable(driver, url) returning an ArticleSoup
+    save_article:   callable(article_soup), runs on the calling thread
+    drivers:        WebDrivers of the article threads, one thread each
+    """
+
+    url_queue = queue.Queue(maxsize=queue_size)
+    output_queue = queue.Queue()
+    stop = threading.Event()
+
+    threads = [
+        threading.Thread(
+            target=_listing_worker,
+            args=(listing, url_queue, output_queue, stop, len(drivers)),
+            daemon=True,
+        )
+    ] + [
+        threading.Thread(
+            target=_article_worker,
+            args=(
+                driver,
+                fetch_article,
+                url_queue,
+                output_queue,
+                stop,
+                last_collected,
+            ),
+            daemon=True,
+        )
+        for driver in drivers
+    ]
+
+    for thread in threads:
+        thread.start()
+
+    running = len(threads)
+    failure = None
+
+    try:
+        while running:
+            message, payload = output_queue.get()
+
+            if message == _DONE:
+                running -= 1
+            elif message == _ERROR:
+                url, kind, error = payload
+                if url is not None:
+                    retry_queue.add(url, kind, error)
+            elif message == _ARTICLE:
+                save_article(payload)
+            elif message == _FAILED:
+                failure = failure or payload
+
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    if failure is not None:
+        raise failure
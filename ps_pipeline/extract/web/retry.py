@@ -0,0 +1,164 @@
+"""
+Retry queue for pages the WebDrivers failed to load, with a dead-letter file
+that carries pages over to the next run.
+"""
+
+__author__ = "Johanan Tai"
+
+import json
+import time
+import random
+from pathlib import Path
+from datetime import datetime
+
+from selenium.common.exceptions import WebDriverException
+
+from ps_pipeline.dates import comparable, parse as datetimeparse, source_of
+from ps_pipeline.extract.web.http_cache import ARTICLE, LISTING
+
+
+def _collected(article_soup, last_collected) -> bool:
+    """Whether the article is at or before the last collected one"""
+
+    if not last_collected or not article_soup.timestamp:
+        return False
+
+    published = datetimeparse(article_soup.timestamp, source_of(article_soup.url))
+
+    published, last_collected = comparable(published, last_collected)
+    return published <= last_collected
+
+
+class RetryQueue:
+
+    def __init__(self, max_attempts=3, base_delay=2.0, max_delay=60.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        # url -> kind of page to be retried
+        self.pending = {}
+        # url -> number of failed attempts
+        self.attempts = {}
+        # url -> {'kind':..., 'attempts':..., 'error':..., 'failed_at':...}
+        self.dead_letter = {}
+
+    def add(self, url, kind=ARTICLE, error=None):
+        """Records a failed attempt and queues the url, unless it ran out of attempts"""
+
+        self.attempts[url] = self.attempts.get(url, 0) + 1
+
+        if self.attempts[url] < self.max_attempts:
+            self.pending[url] = kind
+        else:
+            self.pending.pop(url, None)
+            self.dead_letter[url] = {
+                "kind": kind,
+                "attempts": self.attempts[url],
+                "error": str(error).strip() if error else None,
+                "failed_at": datetime.now().isoformat(),
+            }
+
+    def backoff(self, url):
+        """Exponential backoff with jitter, on the number of failed attempts"""
+
+        attempts = self.attempts.get(url, 0)
+        if not attempts:
+            return 0
+
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.5)
+
+    def drain(
+        self, fetch_article, save_article, fetch_listing=None, last_collected=None
+    ):
+        """
+        Retries every pending page until each either succeeds or is dead-lettered.
+
+        The articles of a retried listing page are fetched in the same pass, in
+        listing order, up to the first one at or before last_collected, as the
+        scrape that failed on the listing would have. Articles retried on their
+        own are saved whatever their date, as they were never collected.
+
+        Returns the saved articles.
+        """
+
+        saved = []
+
+        while self.pending:
+            url = next(iter(self.pending))
+            kind = self.pending.pop(url)
+
+            # Listing pages that cannot be revisited by url are dropped rather than
+            # carried over, as their articles are listed again by the next scrape
+            if kind == LISTING and fetch_listing is None:
+                self.attempts.pop(url, None)
+                continue
+
+            time.sleep(self.backoff(url))
+
+            try:
+                if kind == LISTING:
+                    article_urls = fetch_listing(url)
+                else:
+                    article_soup = fetch_article(url)
+
+            except WebDriverException as e:
+                self.add(url, kind, e)
+                continue
+
+            if kind != LISTING:
+                save_article(article_soup)
+                saved.append(article_soup)
+                continue
+
+            for article_url in article_urls:
+                try:
+                    article_soup = fetch_article(article_url)
+                except WebDriverException as e:
+                    self.add(article_url, ARTICLE, e)
+                    continue
+
+                if _collected(article_soup, last_collected):
+                    break
+
+                save_article(article_soup)
+                saved.append(article_soup)
+
+        return saved
+
+    def __len__(self):
+        return len(self.pending)
+
+    def save(self, filepath: Path):
+        """Persists the dead-letter list, along with pages that are still pending"""
+
+        dead_letter = self.dead_letter | {
+            url: {
+                "kind": kind,
+                "attempts": self.attempts.get(url, 0),
+                "error": None,
+                "failed_at": None,
+            }
+            for url, kind in self.pending.items()
+        }
+
+        filepath.parent.mkdir(exist_ok=True)
+
+        with open(filepath, "w") as f:
+            json.dump(dead_letter, f, indent=4)
+
+    @classmethod
+    def load(cls, filepath: Path, **kwargs):
+        """Queues the dead-letter list of the previous run with fresh attempts"""
+
+        retry_queue = cls(**kwargs)
+
+        if filepath.exists():
+            with open(filepath, "r") as f:
+                dead_letter = json.load(f)
+
+            for url, entry in dead_letter.items():
+                retry_queue.pending[url] = entry.get("kind", ARTICLE)
+
+        return retry_queue
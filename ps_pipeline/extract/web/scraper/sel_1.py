@@ -5,46 +5,89 @@ Web Driver module open a browser object and executes a parser.
 __author__ = "Johanan Tai"
 
 from pathlib import Path
-from collections import defaultdict
-from dateutil.parser import parse as datetimeparse
 
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import WebDriverException
 from tqdm import tqdm
 
+from ps_pipeline.dates import comparable, parse as datetimeparse, source_of
+from ps_pipeline.extract.web.driver import create_chrome_driver, get_page_source
+from ps_pipeline.extract.web.http_cache import HTTPCache
+from ps_pipeline.extract.web.retry import RetryQueue, LISTING
+
 
 def scrape(
     main_url,
     web_parser,
     html_path: Path,
     last_collected=None,
+    retry_queue: RetryQueue = None,
+    http_cache: HTTPCache = None,
 ):
 
-    chrome_service = Service()
-    chrome_options = Options()
-    chrome_options.add_argument("incognito")
-    chrome_options.add_argument("headless")
-    chrome_driver = webdriver.Chrome(service=chrome_service, options=chrome_options)
+    chrome_driver = create_chrome_driver()
+    retry_queue = retry_queue if retry_queue is not None else RetryQueue()
 
-    chrome_driver.get(main_url)
+    listing_content = getattr(web_parser, "LISTING_CONTENT", None)
+    article_content = getattr(web_parser, "ARTICLE_CONTENT", None)
 
-    page_urls = web_parser.get_page_urls(chrome_driver.page_source, main_url)
+    def fetch_listing(url):
+        return [
+            a_link.geturl()
+            for a_link in web_parser.get_article_urls(
+                get_page_source(
+                    chrome_driver, url, listing_content, http_cache, LISTING
+                ),
+                main_url,
+            )
+            if a_link
+        ]
+
+    def fetch_article(url):
+        return web_parser.ArticleSoup(
+            get_page_source(chrome_driver, url, article_content, http_cache)
+        )
+
+    def save_article(article_soup):
+        partial_url = (
+            article_soup.url.strip("/").rpartition("/")[-1]
+            if article_soup.url
+            else "article_title"
+        )
+
+        article_soup.save_to_file(
+            html_path,
+            partial_url,
+        )
+        articles.append(article_soup)
+        articles_p_bar.update(1)
 
-    listing_p_bar = tqdm(total=len(page_urls), desc="Article listing iterated...")
+    articles = []
     articles_p_bar = tqdm(total=0, desc="Articles gathered...")
 
-    articles = []
-    pages_with_errors = defaultdict(list)
+    # Pages that failed in the previous run are picked up first
+    retry_queue.drain(fetch_article, save_article, fetch_listing, last_collected)
+
+    page_urls = web_parser.get_page_urls(
+        get_page_source(
+            chrome_driver, main_url, listing_content, http_cache, LISTING
+        ),
+        main_url,
+    )
+
+    listing_p_bar = tqdm(total=len(page_urls), desc="Article listing iterated...")
 
     for p_link in page_urls:
 
         try:
-            chrome_driver.get(p_link.geturl())
-
             article_urls = web_parser.get_article_urls(
-                chrome_driver.page_source, main_url
+                get_page_source(
+                    chrome_driver,
+                    p_link.geturl(),
+                    listing_content,
+                    http_cache,
+                    LISTING,
+                ),
+                main_url,
             )
 
             articles_p_bar.total = int(
@@ -57,34 +100,26 @@ def scrape(
             for a_link in article_urls:
                 try:
                     if a_link:
-                        chrome_driver.get(a_link.geturl())
-
                         ### ARTICLE EXTRACTION STARTS ###
-                        article_soup = web_parser.ArticleSoup(chrome_driver.page_source)
+                        article_soup = fetch_article(a_link.geturl())
 
                         # Stop collecting if the current article datetime is older or equal to
                         # the last collected datetime
                         if last_collected and article_soup.timestamp:
-                            if datetimeparse(article_soup.timestamp) <= last_collected:
+                            published, last = comparable(
+                                datetimeparse(
+                                    article_soup.timestamp, source_of(article_soup.url)
+                                ),
+                                last_collected,
+                            )
+                            if published <= last:
                                 break
 
-                        partial_url = (
-                            article_soup.url.strip("/").rpartition("/")[-1]
-                            if article_soup.url
-                            else "article_title"
-                        )
-
-                        article_soup.save_to_file(
-                            html_path,
-                            partial_url,
-                        )
-                        articles.append(article_soup)
+                        save_article(article_soup)
                         ### ARTICLE EXTRACTION ENDS ###
 
-                        articles_p_bar.update(1)
-
-                except WebDriverException:
-                    pages_with_errors[p_link.geturl()].append(a_link.geturl())
+                except WebDriverException as e:
+                    retry_queue.add(a_link.geturl(), error=e)
                     continue
             else:
                 listing_p_bar.update(1)
@@ -92,8 +127,11 @@ def scrape(
 
             break
 
-        except WebDriverException:
-            pages_with_errors[p_link.geturl()]
+        except WebDriverException as e:
+            retry_queue.add(p_link.geturl(), LISTING, e)
             continue
 
+    # Final retry pass on the pages that failed during this run
+    retry_queue.drain(fetch_article, save_article, fetch_listing, last_collected)
+
     return [a.extract() for a in articles]
@@ -4,101 +4,129 @@ Web Driver module open a browser object and executes a parser.
 
 __author__ = "Johanan Tai"
 
+import os
 from pathlib import Path
-from collections import defaultdict
-from dateutil.parser import parse as datetimeparse
 from urllib.parse import urlparse, urljoin
 
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import WebDriverException
 from tqdm import tqdm
 
+from ps_pipeline.extract.web.driver import create_chrome_driver, get_page_source
+from ps_pipeline.extract.web.http_cache import HTTPCache
+from ps_pipeline.extract.web.pipeline import pipelined_scrape
+from ps_pipeline.extract.web.retry import RetryQueue, LISTING
+
 
 def scrape(
     main_url,
     web_parser,
     html_path: Path,
     last_collected=None,
+    retry_queue: RetryQueue = None,
+    http_cache: HTTPCache = None,
 ):
 
-    chrome_service = Service()
-    chrome_options = Options()
-    chrome_options.add_argument("incognito")
-    chrome_options.add_argument("headless")
-
-    chrome_driver = webdriver.Chrome(service=chrome_service, options=chrome_options)
-    chrome_driver_2 = webdriver.Chrome(service=chrome_service, options=chrome_options)
-
-    chrome_driver.get(main_url)
+    article_workers = int(os.getenv("SCRAPER_ARTICLE_WORKERS", 1))
 
-    listing_p_bar = tqdm(total=1, desc="Article listing iterated...")
-    articles_p_bar = tqdm(total=0, desc="Articles gathered...")
+    chrome_driver = create_chrome_driver()
+    article_drivers = [create_chrome_driver() for _ in range(article_workers)]
+    retry_queue = retry_queue if retry_queue is not None else RetryQueue()
 
-    articles = []
-    pages_with_errors = defaultdict(list)
+    listing_content = getattr(web_parser, "LISTING_CONTENT", None)
+    article_content = getattr(web_parser, "ARTICLE_CONTENT", None)
 
-    while True:
-        try:
+    def fetch_listing(url):
+        return [
+            a_link.geturl()
+            for a_link in web_parser.get_article_urls(
+                get_page_source(
+                    chrome_driver, url, listing_content, http_cache, LISTING
+                ),
+                main_url,
+            )
+        ]
+
+    def fetch_article(driver, url):
+        return web_parser.ArticleSoup(
+            get_page_source(driver, url, article_content, http_cache)
+        )
+
+    def save_article(article_soup):
+        partial_url = (
+            article_soup.url.strip("/").rpartition("/")[-1]
+            if article_soup.url
+            else "article_title"
+        )
+
+        article_soup.save_to_file(
+            html_path / "HTML_FILES",
+            partial_url,
+        )
+        articles.append(article_soup)
+        articles_p_bar.update(1)
+
+    def listing(report_error):
+        page_number = 1
+        failed_in_a_row = 0
+
+        while failed_in_a_row < retry_queue.max_attempts:
             p_link = urlparse(
-                urljoin(main_url, f"{web_parser.URL_QUERY}{listing_p_bar.total}")
+                urljoin(main_url, f"{web_parser.URL_QUERY}{page_number}")
             )
-            chrome_driver.get(p_link.geturl())
+            page_number += 1
 
-            article_urls = web_parser.get_article_urls(
-                chrome_driver.page_source, main_url
-            )
-            articles_p_bar.total = int(articles_p_bar.n + len(article_urls))
-            articles_p_bar.refresh()
+            try:
+                article_urls = fetch_listing(p_link.geturl())
+                failed_in_a_row = 0
 
-            for a_link in article_urls:
-                try:
-                    chrome_driver_2.get(a_link.geturl())
-
-                    ### ARTICLE EXTRACTION STARTS ###
-                    article_soup = web_parser.ArticleSoup(chrome_driver_2.page_source)
-
-                    # Stop collecting if the current article datetime is older or equal to
-                    # the last collected datetime
-                    if last_collected and article_soup.timestamp:
-                        if datetimeparse(article_soup.timestamp) <= datetimeparse(
-                            last_collected
-                        ):
-                            article_urls.clear()
-                            break
-
-                    partial_url = (
-                        article_soup.url.strip("/").rpartition("/")[-1]
-                        if article_soup.url
-                        else "article_title"
-                    )
-
-                    article_soup.save_to_file(
-                        html_path / "HTML_FILES",
-                        partial_url,
-                    )
-                    articles.append(article_soup)
-
-                    ### ARTICLE EXTRACTION ENDS ###
-
-                    articles_p_bar.update(1)
-
-                except WebDriverException:
-                    pages_with_errors[p_link.geturl()] = a_link.geturl()
-                    continue
-            else:
-                listing_p_bar.update(1)
+            except WebDriverException as e:
+                # Moves on to the next listing page instead of reloading the failed one
+                report_error(p_link.geturl(), e)
+                failed_in_a_row += 1
                 continue
 
-            if article_urls:
-                listing_p_bar.total += 1
-                listing_p_bar.refresh()
-            else:
+            # Listing pages past the last one have no articles
+            if not article_urls:
                 break
 
-        except WebDriverException:
-            pages_with_errors[p_link.geturl()]
-            continue
+            articles_p_bar.total += len(article_urls)
+            articles_p_bar.refresh()
+
+            yield article_urls
+
+            listing_p_bar.update(1)
+            listing_p_bar.total += 1
+            listing_p_bar.refresh()
+
+    articles = []
+    articles_p_bar = tqdm(total=0, desc="Articles gathered...")
+
+    # Pages that failed in the previous run are picked up first
+    retry_queue.drain(
+        lambda url: fetch_article(article_drivers[0], url),
+        save_article,
+        fetch_listing,
+        last_collected,
+    )
+
+    listing_p_bar = tqdm(total=1, desc="Article listing iterated...")
+
+    # The listing driver iterates ahead while the article drivers fetch
+    pipelined_scrape(
+        listing,
+        fetch_article,
+        save_article,
+        article_drivers,
+        retry_queue,
+        last_collected,
+    )
+
+    # Final retry pass on the pages that failed during this run
+    retry_queue.drain(
+        lambda url: fetch_article(article_drivers[0], url),
+        save_article,
+        fetch_listing,
+        last_collected,
+    )
 
     return [a.extract() for a in articles]
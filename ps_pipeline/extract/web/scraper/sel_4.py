@@ -0,0 +1,84 @@
+"""
+Web Driver module open a browser object and executes a parser, on the article
+urls discovered from an RSS/Atom feed or XML sitemap.
+"""
+
+__author__ = "Johanan Tai"
+
+from pathlib import Path
+
+from selenium.common.exceptions import WebDriverException
+from tqdm import tqdm
+
+from ps_pipeline.extract.web.discovery import discover, fetch_xml
+from ps_pipeline.extract.web.driver import create_chrome_driver, get_page_source
+from ps_pipeline.extract.web.http_cache import HTTPCache, FEED
+from ps_pipeline.extract.web.retry import RetryQueue
+
+
+def scrape(
+    main_url,
+    web_parser,
+    html_path: Path,
+    last_collected=None,
+    retry_queue: RetryQueue = None,
+    http_cache: HTTPCache = None,
+    feed_url=None,
+    collected_urls=None,
+):
+
+    retry_queue = retry_queue if retry_queue is not None else RetryQueue()
+
+    # An unchanged feed is revalidated instead of downloaded again
+    article_urls = discover(
+        feed_url or main_url,
+        collected_urls,
+        last_collected,
+        fetch=(
+            (lambda url: http_cache.fetch(url, FEED))
+            if http_cache is not None
+            else fetch_xml
+        ),
+    )
+
+    if not article_urls and not retry_queue:
+        return []
+
+    chrome_driver = create_chrome_driver()
+    article_content = getattr(web_parser, "ARTICLE_CONTENT", None)
+
+    def fetch_article(url):
+        return web_parser.ArticleSoup(
+            get_page_source(chrome_driver, url, article_content, http_cache)
+        )
+
+    def save_article(article_soup):
+        partial_url = (
+            article_soup.url.strip("/").rpartition("/")[-1]
+            if article_soup.url
+            else "article_title"
+        )
+
+        article_soup.save_to_file(
+            html_path,
+            partial_url,
+        )
+        articles.append(article_soup)
+        articles_p_bar.update(1)
+
+    articles = []
+    articles_p_bar = tqdm(total=len(article_urls), desc="Articles gathered...")
+
+    # Pages that failed in the previous run are picked up first
+    retry_queue.drain(fetch_article, save_article)
+
+    for url in article_urls:
+        try:
+            save_article(fetch_article(url))
+        except WebDriverException as e:
+            retry_queue.add(url, error=e)
+
+    # Final retry pass on the pages that failed during this run
+    retry_queue.drain(fetch_article, save_article)
+
+    return [a.extract() for a in articles]
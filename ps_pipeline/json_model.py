@@ -4,11 +4,117 @@ Module to parse and write as JSON objects. May serve as a backup to a relational
 
 __author__ = "Johanan Tai"
 
+import gzip
 import json
+import bisect
+import functools
+from dataclasses import dataclass, field, fields
 from datetime import datetime
-from dateutil.parser import parse as datetimeparse
 from pathlib import Path
 
+from ps_pipeline.dates import comparable, parse_many, source_of
+
+# Optional: faster JSON codec, the standard library is used otherwise
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Optional: zstandard compressed files, gzip is in the standard library
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+JSON_SUFFIXES = (".json", ".json.gz", ".json.zst")
+
+
+# ===============
+#     CODEC
+# ===============
+def dumps(obj, indent=True) -> bytes:
+    """Encodes into UTF-8 JSON, either indented for humans or compact"""
+    if orjson is not None:
+        # Records are encoded by their JSON keys, not by their attribute names
+        option = orjson.OPT_PASSTHROUGH_DATACLASS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_encode, option=option)
+
+    return json.dumps(
+        obj,
+        default=_encode,
+        indent=4 if indent else None,
+        separators=None if indent else (",", ":"),
+        ensure_ascii=False,
+    ).encode("utf-8")
+
+
+def loads(data: bytes | str):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def dump_stream(items, fp, indent=True):
+    """
+    Writes the items as a JSON array straight to the binary file handle, one
+    element at a time. Compact arrays have one element per line.
+    """
+    fp.write(b"[")
+
+    for i, item in enumerate(items):
+        fp.write(b",\n" if i else b"\n")
+        encoded = dumps(item, indent)
+
+        if indent:
+            encoded = b"\n".join(b"    " + line for line in encoded.split(b"\n"))
+
+        fp.write(encoded)
+
+    fp.write(b"\n]\n")
+
+
+def is_json_file(filepath: Path) -> bool:
+    return filepath.name.endswith(JSON_SUFFIXES)
+
+
+def json_files(directory: Path) -> list[Path]:
+    """Plain and compressed JSON files of a directory, oldest first"""
+    return sorted(
+        filter(is_json_file, directory.iterdir()), key=lambda f: f.stat().st_mtime
+    )
+
+
+def open_json(filepath: Path, mode="rb", compression=None):
+    """
+    Opens a JSON file as a binary stream, (de)compressed on the fly when the
+    compression, or else the file suffix, is 'gz' or 'zst'.
+    """
+
+    compression = compression or Path(filepath).suffix.lstrip(".")
+
+    if compression == "gz":
+        return gzip.open(filepath, mode)
+
+    if compression == "zst":
+        if zstandard is None:
+            raise ImportError("zstandard is needed for .json.zst files")
+
+        f = open(filepath, mode)
+        if "r" in mode:
+            return zstandard.ZstdDecompressor().stream_reader(f, closefd=True)
+        return zstandard.ZstdCompressor().stream_writer(f, closefd=True)
+
+    return open(filepath, mode)
+
+
+def read_json(filepath: Path):
+    with open_json(filepath) as f:
+        return loads(f.read())
+
+
+#   ###
+
 
 class JSONObject:
     def __init__(self, data: dict | list, as_root: bool = True):
@@ -41,207 +147,286 @@ class JSONObject:
             except KeyError:
                 return None
 
-    def save(self, export_path: Path, filename=None):
+    def save(
+        self, export_path: Path, filename=None, compact=False, compression=None
+    ) -> Path:
+        """
+        Streams the data into a timestamped file. Compact files are meant for
+        the next stage to read, indented ones for people to review.
+        Compression is either None, 'gz' or 'zst'.
+        """
+
+        filepath = self._export_filepath(export_path, filename, compression)
+
+        with open_json(filepath, "wb") as f:
+            if self.__as_root and isinstance(self.__data, list):
+                dump_stream(self.__data, f, indent=not compact)
+            else:
+                data = self.__data if self.__as_root else {self.name: self.__data}
+                f.write(dumps(data, indent=not compact))
+
+        return filepath
+
+    @classmethod
+    def save_stream(
+        cls, items, export_path: Path, filename=None, compact=False, compression=None
+    ) -> Path:
+        """
+        Streams the items, e.g. from a generator, into the file save() would
+        write them to as a list, without holding them
+        """
+
+        filepath = cls._export_filepath(export_path, filename, compression)
 
+        with open_json(filepath, "wb") as f:
+            dump_stream(items, f, indent=not compact)
+
+        return filepath
+
+    @classmethod
+    def _export_filepath(cls, export_path: Path, filename, compression) -> Path:
         export_path.mkdir(exist_ok=True)
         timestamp = datetime.strftime(datetime.now(), "%Y-%m-%d-%H%M%S-%f")
+        name = f"{filename if filename else ''}{cls.__name__}_{timestamp}.json"
+        filepath = export_path / name
+        if compression:
+            filepath = filepath.with_name(f"{filepath.name}.{compression}")
 
-        with open(
-            export_path / f"{filename if filename else ''}{self.name}_{timestamp}.json",
-            "w",
-        ) as f:
-            f.write(str(self))
+        return filepath
 
     def __len__(self):
         return len(self._data)
 
     def __str__(self) -> str:
         if self.__as_root:
-            return json.dumps(self.__data, indent=4)
+            return dumps(self.__data).decode("utf-8")
         else:
-            return json.dumps({self.name: self.__data}, indent=4)
+            return dumps({self.name: self.__data}).decode("utf-8")
 
     def __repr__(self) -> str:
         return str(self)
 
 
-class Article(JSONObject):
-    def __init__(self, data: dict):
-        super().__init__(data)
+class JSONRecord:
+    """
+    Base of the record types, which are slotted dataclasses decoded once from
+    a JSON object. Each field maps to a JSON key through its metadata.
+    """
 
-    @property
-    def title(self):
-        return self.get("title")
+    __slots__ = ()
 
     @property
-    def url(self):
-        return self.get("source_url")
+    def name(self):
+        return self.__class__.__name__
 
-    @property
-    def timestamp(self):
-        return self.get("publish_time")
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(
+            **{
+                attr: decode(data.get(key)) if decode else data.get(key)
+                for attr, key, decode in _record_fields(cls)
+            }
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            key: _encode(getattr(self, attr))
+            for attr, key, _ in _record_fields(type(self))
+        }
+
+    def get(self, key):
+        for attr, _key, _ in _record_fields(type(self)):
+            if _key == key:
+                return getattr(self, attr)
+        return None
 
-    @property
-    def publish_location(self):
-        return self.get("publish_location")
+    def __str__(self) -> str:
+        return dumps(self.to_dict()).decode("utf-8")
 
-    @property
-    def text(self):
-        return self.get("raw_text")
 
-    @property
-    def type(self):
-        return self.get("article_type")
+@functools.cache
+def _record_fields(cls) -> tuple[tuple[str, str, callable]]:
+    """(attribute, JSON key, decoder) of every field of a record type"""
+    return tuple(
+        (f.name, f.metadata.get("key", f.name), f.metadata.get("decode"))
+        for f in fields(cls)
+    )
 
-    @property
-    def tags(self):
-        return self.get("article_tags")
 
-    @property
-    def web_id(self):
-        return self.get("web_candidate_id")
+def _encode(obj):
+    """Turns records and collections back into their JSON form"""
+    if isinstance(obj, JSONRecord):
+        return obj.to_dict()
+    elif isinstance(obj, JSONObject):
+        return [_encode(o) for o in obj._data]
+    elif isinstance(obj, (list, dict, str, int, float, bool)) or obj is None:
+        return obj
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _decode_all(record_type, data: list) -> list:
+    return [
+        record if isinstance(record, record_type) else record_type.from_dict(record)
+        for record in data
+    ]
+
+
+@dataclass(slots=True)
+class Article(JSONRecord):
+    title: str = None
+    url: str = field(default=None, metadata={"key": "source_url"})
+    timestamp: str = field(default=None, metadata={"key": "publish_time"})
+    publish_location: str = None
+    text: str = field(default=None, metadata={"key": "raw_text"})
+    type: str = field(default=None, metadata={"key": "article_type"})
+    tags: list = field(default=None, metadata={"key": "article_tags"})
+    web_id: str = field(default=None, metadata={"key": "web_candidate_id"})
 
 
 class Articles(JSONObject):
+    """
+    Indexes by url, publish time and article type are built on first use and
+    dropped on mutation, which has to go through append or extend.
+    """
+
     def __init__(self, data: list):
-        super().__init__(data)
+        super().__init__(_decode_all(Article, data))
 
     @property
     def all(self) -> list[Article]:
-        return [Article(article) for article in self._data]
+        return self._data
 
     def select(self, limit) -> list[Article]:
-        return [Article(article) for article in self._data[:limit]]
+        return self._data[:limit]
+
+    def append(self, article: Article | dict):
+        self._data.extend(_decode_all(Article, [article]))
+        self._invalidate()
+
+    def extend(self, articles: list[Article | dict]):
+        self._data.extend(_decode_all(Article, articles))
+        self._invalidate()
+
+    def _invalidate(self):
+        for index in ("by_url", "by_type", "_by_time"):
+            self.__dict__.pop(index, None)
+
+    @functools.cached_property
+    def by_url(self) -> dict[str, Article]:
+        return {article.url: article for article in self._data}
+
+    @functools.cached_property
+    def by_type(self) -> dict[str, list[Article]]:
+        by_type = {}
+        for article in self._data:
+            by_type.setdefault(article.type, []).append(article)
+        return by_type
+
+    @functools.cached_property
+    def _by_time(self) -> tuple[list[datetime], list[Article]]:
+        """Publish datetimes parsed once, sorted along with their articles"""
+        parsed = parse_many(
+            (article.timestamp for article in self._data),
+            (source_of(article.url) for article in self._data),
+        )
+        # Articles without a parsable publish datetime cannot be placed in time
+        timed = [(t, i) for i, t in enumerate(parsed) if t is not None]
+        datetimes = comparable(*(t for t, _ in timed))
+        timed = sorted(zip(datetimes, (i for _, i in timed)))
+        return [t for t, _ in timed], [self._data[i] for _, i in timed]
 
     @property
     def latest(self):
-        datetimes = set()
-
-        for article in self.all:
-            if article.timestamp:
-                datetimes.add(datetimeparse(article.timestamp))
-
-        return max(datetimes)
+        datetimes, _ = self._by_time
+        return datetimes[-1] if datetimes else None
 
     @property
     def urls(self):
-        urls = set()
+        return self.by_url.keys()
 
-        for article in self.all:
-            urls.add(article.url)
-
-        return urls
+    def since(self, since: datetime, inclusive=False) -> list[Article]:
+        """Articles published after the datetime, oldest first"""
+        datetimes, articles = self._by_time
+        if datetimes and (datetimes[0].tzinfo is None) != (since.tzinfo is None):
+            since, *datetimes = comparable(since, *datetimes)
+        position = (bisect.bisect_left if inclusive else bisect.bisect_right)(
+            datetimes, since
+        )
+        return articles[position:]
 
 
 # ===============
 #   TRANSFORM
 # ===============
-class TransformedArticle(Article):
-    def __init__(self, data: dict):
-        super().__init__(data)
-
-    @property
-    def nlp_extracts(self):
-        return NLPExtracts(self.get("statements"))
-
-
-class TransformedArticles(JSONObject):
-    def __init__(self, data: dict | list):
-        super().__init__(data)
-
-    @property
-    def all(self) -> list[TransformedArticle]:
-        return [TransformedArticle(article) for article in self._data]
-
-
-class NLPExtract(JSONObject):
-    def __init__(self, data: dict):
-        super().__init__(data)
-
-    @property
-    def attributed(self):
-        return self.get("attributed")
-
-    @property
-    def text(self):
-        return self.get("text")
-
-    @property
-    def text_type(self):
-        return self.get("text_type")
-
-    @property
-    def classification(self):
-        return self.get("classification")
-
-
 class NLPExtracts(JSONObject):
     def __init__(self, data: list):
-        super().__init__(data)
+        super().__init__(_decode_all(NLPExtract, data or []))
 
     @property
-    def all(self) -> list[NLPExtract]:
-        return [NLPExtract(extract) for extract in self._data]
+    def all(self) -> list["NLPExtract"]:
+        return self._data
 
     @property
     def all_attributed(self):
         return {extract.attributed for extract in self.all if extract.attributed}
 
 
-#   ###
+@dataclass(slots=True)
+class TransformedArticle(JSONRecord):
+    # Keys as written by the transform stage, see transform/__main__.py
+    title: str = field(default=None, metadata={"key": "article_title"})
+    timestamp: str = field(default=None, metadata={"key": "article_timestamp"})
+    url: str = field(default=None, metadata={"key": "article_url"})
+    text: str = field(default=None, metadata={"key": "article_text"})
+    publish_location: str = None
+    nlp_extracts: NLPExtracts = field(
+        default=None, metadata={"key": "statements", "decode": NLPExtracts}
+    )
 
 
-# ===============
-#      LOAD
-# ===============
-class HarvestArticle(JSONObject):
-    def __init__(self, data: dict):
-        super().__init__(data)
-
-    @property
-    def candidate_ids(self):
-        return self.get("candidate_ids")
-
-    @property
-    def speechtype_id(self):
-        return self.get("speechtype_id")
+class TransformedArticles(JSONObject):
+    def __init__(self, data: list):
+        super().__init__(_decode_all(TransformedArticle, data))
 
     @property
-    def title(self):
-        return self.get("title")
+    def all(self) -> list[TransformedArticle]:
+        return self._data
 
-    @property
-    def speechdate(self):
-        return self.get("speechdate")
 
-    @property
-    def location(self):
-        return self.get("location")
+@dataclass(slots=True)
+class NLPExtract(JSONRecord):
+    attributed: str = None
+    text: str = None
+    text_type: str = None
+    classification: str = None
 
-    @property
-    def url(self):
-        return self.get("url")
 
-    @property
-    def speechtext(self):
-        return self.get("speechtext")
+#   ###
 
-    @property
-    def review(self) -> bool:
-        return self.get("review")
 
-    @property
-    def review_message(self) -> str:
-        return self.get("review_msg")
+# ===============
+#      LOAD
+# ===============
+@dataclass(slots=True)
+class HarvestArticle(JSONRecord):
+    candidate_ids: list = None
+    speechtype_id: int = None
+    title: str = None
+    speechdate: str = None
+    location: str = None
+    url: str = None
+    speechtext: str = None
+    review: bool = None
+    review_message: str = field(default=None, metadata={"key": "review_msg"})
 
 
 class HarvestArticles(JSONObject):
-    def __init__(self, data: dict | list):
-        super().__init__(data)
+    def __init__(self, data: list):
+        super().__init__(_decode_all(HarvestArticle, data))
 
     @property
     def all(self) -> list[HarvestArticle]:
-        return [HarvestArticle(harvest) for harvest in self._data]
+        return self._data
 
 
 #   ###
@@ -0,0 +1,212 @@
+"""
+Module to lazily read the JSON array files of the pipeline stages, parsing
+only the elements that are asked for.
+"""
+
+__author__ = "Johanan Tai"
+
+import json
+import codecs
+from pathlib import Path
+
+from ps_pipeline.json_model import (
+    JSONRecord,
+    Article,
+    _record_fields,
+    loads,
+    open_json,
+)
+from ps_pipeline.schema import Quarantine
+
+
+class JSONArrayReader:
+    """
+    Streams the elements of a JSON array file as records. Files ending in .gz
+    or .zst are decompressed on the fly, where the offsets are uncompressed.
+
+    A sidecar offset index (<file>.idx) holding the byte span and url of each
+    element is built on the first random access, so that slicing and lookups
+    by url only seek and parse the elements they touch.
+    """
+
+    def __init__(
+        self,
+        filepath: Path,
+        record_type: type = Article,
+        chunk_size=1 << 16,
+        quarantine: Quarantine = None,
+    ):
+        self.filepath = Path(filepath)
+        self.record_type = record_type
+        self.chunk_size = chunk_size
+        # Iterated elements are validated when there is a quarantine for them
+        self.quarantine = quarantine
+        self.__index = None
+
+    @property
+    def index_path(self) -> Path:
+        return self.filepath.with_name(self.filepath.name + ".idx")
+
+    def _url_key(self):
+        for attr, key, _ in _record_fields(self.record_type):
+            if attr == "url":
+                return key
+        return None
+
+    def _decode(self, data: dict) -> JSONRecord:
+        return self.record_type.from_dict(data)
+
+    def _iter_raw(self):
+        """Yields (start byte, end byte, element) of each element of the array"""
+
+        decoder = json.JSONDecoder()
+        text_decoder = codecs.getincrementaldecoder("utf-8")()
+
+        with open_json(self.filepath) as f:
+            buffer = ""
+            position = 0
+            # Byte offset in the file of buffer[position]
+            byte_position = 0
+            started = False
+            eof = False
+            read_size = self.chunk_size
+
+            while True:
+                # Skips whitespace, the opening bracket and separators
+                while position < len(buffer) and buffer[position] in " \t\r\n,[":
+                    if buffer[position] == "[":
+                        if started:
+                            break
+                        started = True
+                    position += 1
+                    byte_position += 1
+
+                if position < len(buffer) and buffer[position] == "]":
+                    return
+
+                try:
+                    if position >= len(buffer):
+                        raise ValueError("Buffer exhausted")
+
+                    element, end = decoder.raw_decode(buffer, position)
+
+                except ValueError:
+                    if eof:
+                        if buffer[position:].strip():
+                            raise
+                        return
+
+                    # Drops what has been consumed before reading further
+                    buffer = buffer[position:]
+                    position = 0
+
+                    chunk = f.read(read_size)
+                    eof = not chunk
+                    buffer += text_decoder.decode(chunk, final=eof)
+
+                    # Elements larger than a chunk are read in growing chunks
+                    read_size = min(read_size * 2, 1 << 26)
+                    continue
+
+                read_size = self.chunk_size
+                start = byte_position
+                byte_position += len(buffer[position:end].encode("utf-8"))
+
+                yield start, byte_position, element
+                position = end
+
+    def __iter__(self):
+        elements = (element for _, _, element in self._iter_raw())
+
+        if self.quarantine is not None:
+            yield from self.quarantine.filter(
+                elements, self.record_type, self.filepath.name
+            )
+        else:
+            for element in elements:
+                yield self._decode(element)
+
+    def select(self, limit) -> list[JSONRecord]:
+        """Parses the first elements only, which does not need the index"""
+
+        selected = []
+        if not limit:
+            return selected
+
+        for record in self:
+            selected.append(record)
+            if len(selected) >= limit:
+                break
+
+        return selected
+
+    # ===============
+    #      INDEX
+    # ===============
+    @property
+    def index(self) -> dict:
+        """Offsets and urls of every element, rebuilt when the file changes"""
+
+        if self.__index is not None:
+            return self.__index
+
+        stat = self.filepath.stat()
+
+        if self.index_path.exists():
+            with open(self.index_path, "rb") as f:
+                index = loads(f.read())
+
+            if (index.get("size"), index.get("mtime")) == (
+                stat.st_size,
+                stat.st_mtime,
+            ):
+                self.__index = index
+                return index
+
+        url_key = self._url_key()
+        offsets = []
+        urls = {}
+
+        for i, (start, stop, element) in enumerate(self._iter_raw()):
+            offsets.append((start, stop))
+            if url_key and isinstance(element, dict) and element.get(url_key):
+                urls.setdefault(element.get(url_key), i)
+
+        self.__index = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "offsets": offsets,
+            "urls": urls,
+        }
+
+        with open(self.index_path, "w") as f:
+            json.dump(self.__index, f)
+
+        return self.__index
+
+    def _read_at(self, f, i) -> JSONRecord:
+        start, stop = self.index["offsets"][i]
+        f.seek(start)
+        return self._decode(loads(f.read(stop - start)))
+
+    def __len__(self):
+        return len(self.index["offsets"])
+
+    def __getitem__(self, i: int | slice):
+        with open_json(self.filepath) as f:
+            if isinstance(i, slice):
+                positions = range(*i.indices(len(self)))
+
+                # Compressed streams are cheap to seek forward only
+                records = {j: self._read_at(f, j) for j in sorted(positions)}
+                return [records[j] for j in positions]
+
+            return self._read_at(f, i if i >= 0 else len(self) + i)
+
+    def by_url(self, url) -> JSONRecord | None:
+        i = self.index["urls"].get(url)
+        if i is None:
+            return None
+
+        with open_json(self.filepath) as f:
+            return self._read_at(f, i)
@@ -5,16 +5,183 @@ Main module that executes the loading pipeline on command.
 __author__ = "Johanan Tai"
 
 import argparse
-import json
-import psycopg
 import os
 
 from pathlib import Path
-from tqdm import tqdm
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 
-from ps_pipeline.load import pipe
-from ps_pipeline.json_model import TransformedArticles, HarvestArticles
+from ps_pipeline.json_model import (
+    TransformedArticle,
+    HarvestArticle,
+    HarvestArticles,
+    json_files,
+)
+from ps_pipeline.json_reader import JSONArrayReader
+from ps_pipeline.schema import Quarantine
+from ps_pipeline.store import open_store
+
+
+def read_transformed(
+    candidate_id, data_directory: Path, store, filepath=None, articles_n=None
+) -> tuple[list[TransformedArticle] | JSONArrayReader, Quarantine]:
+    """
+    The transformed articles to load, along with the quarantine of the invalid
+    ones. Articles read from a file are streamed, so that they are only
+    quarantined as the loading iterates over them.
+    """
+
+    transformed_path = data_directory / candidate_id / "TRANSFORMED_FILES"
+
+    # Articles that would fail halfway through the harvest are set aside
+    quarantine = Quarantine()
+
+    if filepath is None and store is not None:
+        # Only the articles that have not been loaded since they were transformed
+        transformed_articles = list(
+            quarantine.filter(store.pending_load(candidate_id).all, TransformedArticle)
+        )
+        transformed_articles = (
+            transformed_articles[:articles_n] if articles_n else transformed_articles
+        )
+
+    else:
+        transformed_file = (
+            json_files(transformed_path)[-1] if filepath is None else filepath
+        )
+
+        # Only the articles to be processed are parsed
+        json_articles = JSONArrayReader(
+            transformed_file, TransformedArticle, quarantine=quarantine
+        )
+        transformed_articles = (
+            json_articles.select(articles_n) if articles_n else json_articles
+        )
+
+    return transformed_articles, quarantine
+
+
+def load_candidate(
+    candidate_id,
+    transformed_articles,
+    data_directory: Path,
+    references,
+    name_cache,
+    connection_pool=None,
+    skip_seen=False,
+    copy=False,
+    quarantine: Quarantine = None,
+) -> tuple[Path, list[str]]:
+    """
+    Streams the harvest rows of the candidate into its harvest file, and from
+    there into VSDB if copied. Returns the path of the harvest file and the
+    urls of the articles harvested.
+    """
+    from tqdm import tqdm
+    from ps_pipeline.load import pipe
+    from ps_pipeline.load.cache import SeenSet
+    from ps_pipeline.load.sink import (
+        copy_harvest,
+        drop_existing_stream,
+        save_summary,
+    )
+
+    harvest_path = data_directory / candidate_id / "HARVEST_FILES"
+    quarantine_path = data_directory / candidate_id / "QUARANTINE_FILES"
+    summary_path = data_directory / candidate_id / "LOAD_SUMMARIES"
+    # Keys of every harvest row written for the candidate, across runs
+    seen_path = data_directory / candidate_id / "CACHE" / "harvest_seen.txt"
+
+    existing = {}
+    loaded_urls = []
+
+    # A connection is only held for as long as the candidate is being loaded
+    with (
+        connection_pool.connection() if connection_pool else nullcontext()
+    ) as vsdb_connection, SeenSet(seen_path, skip=skip_seen) as seen:
+        harvest_rows = seen.filter(
+            tqdm(
+                pipe.harvest_json(
+                    transformed_articles, references, name_cache, loaded_urls
+                ),
+                desc=candidate_id,
+                unit=" rows",
+            ),
+            pipe.harvest_key,
+        )
+
+        # Speeches VSDB already holds are not harvested again
+        if vsdb_connection is not None:
+            harvest_rows = drop_existing_stream(
+                harvest_rows, vsdb_connection, existing
+            )
+
+        # Rows are written as they are harvested, rather than held until the end
+        harvest_file = HarvestArticles.save_stream(
+            harvest_rows, harvest_path, compression=os.getenv("JSON_COMPRESSION")
+        )
+
+        dropped = {"duplicates": seen.duplicates} | existing
+        print(f"{candidate_id}:", ", ".join(f"{v} {k}" for k, v in dropped.items()))
+
+        # The harvest file is kept as the artifact of what was loaded
+        if copy:
+            summary = copy_harvest(
+                (h.to_dict() for h in JSONArrayReader(harvest_file, HarvestArticle)),
+                vsdb_connection,
+            )
+            print(
+                f"{candidate_id}:",
+                ", ".join(f"{v} {k}" for k, v in summary.items()),
+                "->",
+                save_summary(summary, summary_path),
+            )
+
+    if quarantine:
+        print(
+            f"{len(quarantine)} invalid articles of {candidate_id} quarantined to",
+            quarantine.save(quarantine_path, "TransformedArticle"),
+        )
+
+    return harvest_file, loaded_urls
+
+
+def load_candidates(
+    candidate_inputs: dict[str, tuple[list[TransformedArticle], Quarantine]],
+    data_directory: Path,
+    references,
+    name_cache,
+    connection_pool=None,
+    workers=1,
+    skip_seen=False,
+    copy=False,
+):
+    """
+    Loads the candidates concurrently, yielding (candidate id, harvest file,
+    loaded urls) as each finishes. The pool is anything with a connection()
+    context manager, e.g. a psycopg_pool.ConnectionPool.
+    """
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                load_candidate,
+                candidate_id,
+                articles,
+                data_directory,
+                references,
+                name_cache,
+                connection_pool,
+                skip_seen,
+                copy,
+                quarantine,
+            ): candidate_id
+            for candidate_id, (articles, quarantine) in candidate_inputs.items()
+        }
+
+        for future in as_completed(futures):
+            yield futures[future], *future.result()
 
 
 def main():
@@ -27,7 +194,8 @@ def main():
         "-c",
         "--candidate_id",
         required=True,
-        help="Candidate ID",
+        nargs="+",
+        help="Candidate ID(s), loaded together in one process",
     )
 
     parser.add_argument(
@@ -44,8 +212,56 @@ def main():
         help="Limit the number of articles to process",
     )
 
+    parser.add_argument(
+        "-o",
+        "--offline",
+        action="store_true",
+        help="Use the cached reference tables without connecting to VSDB",
+    )
+
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=int(os.getenv("LOAD_WORKERS") or 4),
+        help="Number of candidates loaded concurrently",
+    )
+
+    parser.add_argument(
+        "-s",
+        "--skip_seen",
+        action="store_true",
+        help="Skip the harvest rows written by earlier runs",
+    )
+
+    parser.add_argument(
+        "--copy",
+        action="store_true",
+        help="Bulk load the harvest rows into VSDB",
+    )
+
     args = parser.parse_args()
 
+    if args.copy and args.offline:
+        print("Harvest rows cannot be loaded into VSDB offline.")
+        exit()
+
+    if args.filepath is not None:
+        if len(args.candidate_id) > 1:
+            print("A filepath can only be given for a single candidate.")
+            exit()
+
+        if not args.filepath.exists():
+            print("Cannot find transformed file.")
+            exit()
+
+    # The database driver and the name matcher are only imported once there is
+    # work to do
+    from psycopg.conninfo import make_conninfo
+    from psycopg_pool import ConnectionPool
+    from ps_pipeline.load import pipe
+    from ps_pipeline.load.cache import NameCache, QueryCache
+
     vsdb_connection_info = {
         "host": os.getenv("VSDB_HOST"),
         "dbname": os.getenv("VSDB_DATABASE"),
@@ -55,44 +271,86 @@ def main():
     }
 
     data_directory = Path(os.getenv("DATA_FILES_DIRECTORY"))
-    transformed_path = data_directory / args.candidate_id / "TRANSFORMED_FILES"
-    harvest_path = data_directory / args.candidate_id / "HARVEST_FILES"
+    # Shared by every candidate, as they are matched against the same roster
+    name_cache_path = data_directory / "CACHE" / "name_resolutions.json"
+    query_cache_path = data_directory / "CACHE" / "REFERENCE_QUERIES"
 
-    if args.filepath is None:
-        transformed_files = filter(
-            lambda f: f.name.endswith(".json"), transformed_path.iterdir()
-        )
-        sorted_transformed_files = sorted(
-            transformed_files, key=lambda x: x.stat().st_mtime, reverse=True
-        )
-        with open(sorted_transformed_files[0], "r") as f:
-            json_articles = TransformedArticles(json.load(f))
-    else:
-        if not args.filepath.exists():
-            print("Cannot find transformed file.")
-            exit()
+    store = open_store()
 
-        with open(args.filepath, "r") as f:
-            json_articles = TransformedArticles(json.load(f))
+    name_cache = NameCache(name_cache_path)
+    query_cache = QueryCache(
+        query_cache_path,
+        ttl=float(os.getenv("REFERENCE_CACHE_TTL") or 86400),
+        offline=args.offline,
+    )
+
+    conninfo = (
+        None
+        if args.offline
+        else make_conninfo(**{k: v for k, v in vsdb_connection_info.items() if v})
+    )
 
-    vsdb_connection = psycopg.connect(**vsdb_connection_info)
+    # The reference tables are queried concurrently, once for every candidate
+    references = pipe.References.gather(conninfo, query_cache)
+    # Names resolved against another roster are dropped before any candidate
+    name_cache.use_roster(references.fingerprint)
 
-    transformed_articles = (
-        json_articles.all[: args.articles_n] if args.articles_n else json_articles.all
+    # Connections are set up once and reused by the candidates of the run
+    connection_pool = (
+        None
+        if args.offline
+        else ConnectionPool(conninfo, min_size=1, max_size=args.workers, open=True)
     )
 
-    progress_bar = tqdm(total=len(transformed_articles), desc="Processing")
+    if args.copy:
+        from ps_pipeline.load.sink import harvest_table_exists
+
+        # Fails before any candidate is loaded rather than once it is harvested
+        with connection_pool.connection() as vsdb_connection:
+            if not harvest_table_exists(vsdb_connection):
+                print(
+                    "speech_harvest does not exist in VSDB, create it with "
+                    "python -m ps_pipeline.load.migrate"
+                )
+                exit()
 
-    harvest_data = []
-    for harvest_article in pipe.harvest_json(
-        transformed_articles,
-        vsdb_connection,
+    # The store is read and written from this thread only
+    candidate_inputs = {
+        candidate_id: read_transformed(
+            candidate_id,
+            data_directory,
+            store,
+            args.filepath,
+            args.articles_n,
+        )
+        for candidate_id in args.candidate_id
+    }
+
+    for candidate_id, harvest_file, loaded_urls in load_candidates(
+        candidate_inputs,
+        data_directory,
+        references,
+        name_cache,
+        connection_pool,
+        args.workers,
+        args.skip_seen,
+        args.copy,
     ):
-        if harvest_article not in harvest_data:
-            harvest_data.append(harvest_article)
-            progress_bar.update(1)
+        if store is not None:
+            store.upsert_harvest(
+                candidate_id, JSONArrayReader(harvest_file, HarvestArticle)
+            )
+            store.mark_loaded(candidate_id, loaded_urls)
+
+    if connection_pool is not None:
+        connection_pool.close()
+    if store is not None:
+        store.close()
 
-    HarvestArticles(harvest_data).save(harvest_path)
+    name_cache.save()
+    print(f"Name cache hit rate: {name_cache.hit_rate:.0%}")
+    for k, v in query_cache.stats.items():
+        print(f"Reference cache {k}:", v)
 
 
 if __name__ == "__main__":
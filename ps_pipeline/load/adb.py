@@ -0,0 +1,73 @@
+"""
+Asynchronous access to VSDB, so that the independent queries of a run are
+issued at once rather than one after another.
+"""
+
+__author__ = "Johanan Tai"
+
+from psycopg import AsyncConnection
+
+from ps_pipeline.load import cache
+from ps_pipeline.load.cache import QueryCache
+
+
+async def _connect(conninfo: str | None) -> AsyncConnection | None:
+    # No connection is made without conninfo, when results are cached offline
+    return await AsyncConnection.connect(conninfo) if conninfo is not None else None
+
+
+async def query(
+    conninfo: str | None,
+    query: str,
+    query_cache: QueryCache = None,
+    freshness_query: str = None,
+    **params,
+) -> tuple[list[str], list[list]]:
+    """Headers and rows of the query, run over a connection of its own"""
+
+    connection = await _connect(conninfo)
+
+    try:
+        if query_cache is not None:
+            return await query_cache.fetch(
+                query, connection, freshness_query, **params
+            )
+        return await cache.execute(query, connection, params)
+
+    finally:
+        if connection is not None:
+            await connection.close()
+
+
+async def stream(
+    conninfo: str | None,
+    query: str,
+    query_cache: QueryCache = None,
+    freshness_query: str = None,
+    batch_size=2000,
+    **params,
+):
+    """
+    Rows of the query as named tuples, streamed a batch at a time over a
+    connection of its own
+    """
+
+    connection = await _connect(conninfo)
+
+    try:
+        rows = (
+            query_cache.stream(query, connection, freshness_query, batch_size, **params)
+            if query_cache is not None
+            else cache.stream(query, connection, params, batch_size)
+        )
+        async for row in rows:
+            yield row
+
+    finally:
+        if connection is not None:
+            await connection.close()
+
+
+def as_reference(rows) -> dict[str, int]:
+    """A two column query result that can be turn into a reference"""
+    return {name: ids for ids, name in rows}
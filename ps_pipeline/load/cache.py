@@ -0,0 +1,316 @@
+"""
+On-disk caches of the loading pipeline, kept across runs.
+"""
+
+__author__ = "Johanan Tai"
+
+import json
+import time
+import uuid
+import hashlib
+import threading
+from pathlib import Path
+from collections import namedtuple
+
+from ps_pipeline.load.matcher import normalize_name
+
+
+def roster_fingerprint(candidates) -> str:
+    """
+    Fingerprint of the (candidate id, name) pairs, which changes whenever a
+    candidate is added, removed or renamed
+    """
+    digest = hashlib.sha1()
+    for candidate_id, name in sorted(candidates, key=str):
+        digest.update(f"{candidate_id}\t{name}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class NameCache:
+    """
+    Resolved candidates of every attributed name, keyed by the normalized name.
+    The resolutions only hold for the roster they were matched against, so
+    they are dropped once its fingerprint changes.
+
+    The cache is shared by the candidates loaded concurrently, so it is read
+    and written under a lock.
+    """
+
+    def __init__(self, cache_path: Path):
+        self.cache_path = cache_path
+        self.fingerprint = None
+        self.names = {}
+        self.stats = {"hits": 0, "misses": 0, "invalidated": 0}
+        self.lock = threading.Lock()
+
+        if cache_path.exists():
+            with open(cache_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+
+            self.fingerprint = cached.get("fingerprint")
+            self.names = cached.get("names", {})
+
+    def use_roster(self, fingerprint: str):
+        """Set once per run, before the cache is shared"""
+
+        with self.lock:
+            if fingerprint != self.fingerprint:
+                self.stats["invalidated"] += len(self.names)
+                self.names = {}
+                self.fingerprint = fingerprint
+
+    def get(self, name) -> list[dict] | None:
+        """The cached candidates, an empty list if the name matched none"""
+
+        key = normalize_name(name)
+        with self.lock:
+            resolved = self.names.get(key)
+            self.stats["hits" if resolved is not None else "misses"] += 1
+        return resolved
+
+    def put(self, name, records: list[dict]):
+        key = normalize_name(name)
+        with self.lock:
+            self.names[key] = records
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def save(self):
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with self.lock, open(self.cache_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "fingerprint": self.fingerprint,
+                    "stats": self.stats | {"hit_rate": self.hit_rate},
+                    "names": self.names,
+                },
+                f,
+                ensure_ascii=False,
+            )
+
+
+class QueryCache:
+    """
+    Results of reference queries, keyed by the query text and parameters.
+
+    ttl:        seconds a result is used for without querying again
+    offline:    only cached results are used, whatever their age
+
+    A freshness query, e.g. a count and a max id, is cheap to run against the
+    database. A cached result within its TTL is only used while the freshness
+    query returns what it returned when the result was cached.
+    """
+
+    def __init__(self, cache_path: Path, ttl: float = 86400, offline=False):
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.offline = offline
+        self.stats = {"hits": 0, "misses": 0, "stale": 0}
+
+    def _entry_path(self, query, params) -> Path:
+        key = json.dumps([query, params], sort_keys=True, default=str)
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return self.cache_path / f"{digest}.json"
+
+    def _read(self, query, params) -> tuple[Path, dict | None]:
+        """The path of the cache entry and the entry, if it was cached"""
+
+        entry_path = self._entry_path(query, params)
+        entry = None
+
+        if entry_path.exists():
+            with open(entry_path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+
+        if self.offline and entry is None:
+            raise LookupError("Query result is not cached, cannot run offline")
+
+        return entry_path, entry
+
+    def _usable(self, entry, freshness_query, freshness) -> bool:
+        if entry is None:
+            self.stats["misses"] += 1
+            return False
+
+        fresh = self.offline or (
+            time.time() - entry["fetched_at"] < self.ttl
+            and (freshness_query is None or entry["freshness"] == freshness)
+        )
+        self.stats["hits" if fresh else "stale"] += 1
+        return fresh
+
+    def _write(self, entry_path, freshness, headers, rows):
+        self.cache_path.mkdir(parents=True, exist_ok=True)
+        with open(entry_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "fetched_at": time.time(),
+                    "freshness": freshness,
+                    "headers": headers,
+                    "rows": rows,
+                },
+                f,
+                default=str,
+            )
+
+    async def fetch(
+        self, query, connection, freshness_query=None, **params
+    ) -> tuple[list[str], list[list]]:
+        """Returns the headers and rows of the query result"""
+
+        entry_path, entry = self._read(query, params)
+        freshness = await self._freshness(freshness_query, connection, params)
+
+        if self._usable(entry, freshness_query, freshness):
+            return entry["headers"], entry["rows"]
+
+        headers, rows = await execute(query, connection, params)
+        self._write(entry_path, freshness, headers, rows)
+
+        # Rows are returned as they would be read back from the cache
+        return headers, _as_cached(rows)
+
+    async def stream(
+        self, query, connection, freshness_query=None, batch_size=2000, **params
+    ):
+        """
+        Streams the rows of the query result as named tuples. Rows fetched from
+        the database are written to the cache as they are streamed, and the
+        entry is only kept once every row was.
+        """
+
+        entry_path, entry = self._read(query, params)
+        freshness = await self._freshness(freshness_query, connection, params)
+
+        if self._usable(entry, freshness_query, freshness):
+            Row = namedtuple("Row", entry["headers"], rename=True)
+            for row in entry["rows"]:
+                yield Row(*row)
+            return
+
+        self.cache_path.mkdir(parents=True, exist_ok=True)
+        partial_path = entry_path.with_suffix(".partial")
+
+        try:
+            with open(partial_path, "w", encoding="utf-8") as f:
+                f.write('{"rows": [')
+                headers = []
+                separator = ""
+
+                async for row in stream(query, connection, params, batch_size):
+                    headers = list(row._fields)
+                    f.write(separator + json.dumps(list(row), default=str))
+                    separator = ", "
+                    yield row
+
+                # The rest of the entry is written once the headers are known
+                entry = {
+                    "fetched_at": time.time(),
+                    "freshness": freshness,
+                    "headers": headers,
+                }
+                f.write("], " + json.dumps(entry)[1:])
+
+            partial_path.replace(entry_path)
+
+        finally:
+            partial_path.unlink(missing_ok=True)
+
+    async def _freshness(self, freshness_query, connection, params):
+        if not freshness_query or self.offline:
+            return None
+
+        _, rows = await execute(freshness_query, connection, params)
+        return _as_cached(rows)
+
+
+def _as_cached(rows):
+    return json.loads(json.dumps(rows, default=str))
+
+
+async def execute(query, connection, params) -> tuple[list[str], list[list]]:
+    cursor = connection.cursor()
+    await cursor.execute(query, params)
+    headers = [str(k[0]) for k in cursor.description]
+    return headers, [list(row) for row in await cursor.fetchall()]
+
+
+async def stream(query, connection, params, batch_size=2000):
+    """
+    Streams the rows of the query as named tuples, fetched in batches through a
+    server-side cursor, so that only one batch is held at a time
+    """
+    from psycopg.rows import namedtuple_row
+
+    async with connection.cursor(
+        name=f"stream_{uuid.uuid4().hex}", row_factory=namedtuple_row
+    ) as cursor:
+        await cursor.execute(query, params)
+        while rows := await cursor.fetchmany(batch_size):
+            for row in rows:
+                yield row
+
+
+class SeenSet:
+    """
+    Keys of the records already written, so that a run can skip what an earlier
+    one wrote. The new keys are appended to the file on a clean exit only, as
+    the records they stand for may not have been written otherwise.
+
+    skip:   whether the keys written by earlier runs are skipped, they are
+            never appended to the file again either way
+    """
+
+    def __init__(self, seen_path: Path = None, skip=True):
+        self.seen_path = seen_path
+        self.skip = skip
+        # Keys already in the file, and the keys seen by this run
+        self.saved = set()
+        self.keys = set()
+        self.new_keys = []
+        self.duplicates = 0
+
+        if seen_path is not None and seen_path.exists():
+            with open(seen_path, "r", encoding="utf-8") as f:
+                self.saved.update(line.strip() for line in f if line.strip())
+
+    def add(self, key: str) -> bool:
+        """Returns whether the key is new"""
+
+        if key in self.keys or (self.skip and key in self.saved):
+            return False
+
+        self.keys.add(key)
+        if key not in self.saved:
+            self.new_keys.append(key)
+        return True
+
+    def filter(self, items, key):
+        """Yields the items with a new key, counting the others as duplicates"""
+
+        for item in items:
+            if self.add(key(item)):
+                yield item
+            else:
+                self.duplicates += 1
+
+    def save(self):
+        if self.seen_path is None or not self.new_keys:
+            return
+
+        self.seen_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.seen_path, "a", encoding="utf-8") as f:
+            f.writelines(key + "\n" for key in self.new_keys)
+        self.saved.update(self.new_keys)
+        self.new_keys = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *_):
+        if exc_type is None:
+            self.save()
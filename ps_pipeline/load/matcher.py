@@ -0,0 +1,160 @@
+"""
+Matches attributed names to candidate records. Candidate names are normalized
+and indexed by token once, so that names are scored in bulk, block by block,
+against the candidates sharing a token with them only.
+"""
+
+__author__ = "Johanan Tai"
+
+import re
+import unicodedata
+from collections import defaultdict
+
+from rapidfuzz import fuzz, process
+
+
+# Scores, out of 100, of the token set ratio between two names
+MATCH_THRESHOLD = 85
+REVIEW_THRESHOLD = 80
+
+MATCHED = "MATCHED"
+REVIEW = "REVIEW"
+AMBIGUOUS = "AMBIGUOUS"
+
+_NON_WORD = re.compile(r"[^\w\s]")
+
+
+def normalize_name(name) -> str:
+    """Lower-cased and without accents, quotes or punctuation"""
+    name = unicodedata.normalize("NFKD", str(name))
+    name = "".join(c for c in name if not unicodedata.combining(c))
+    return " ".join(_NON_WORD.sub(" ", name.lower()).split())
+
+
+class NameMatcher:
+    """
+    rows:       candidate rows, e.g. named tuples as streamed from VSDB, which
+                can also be added one by one
+    workers:    threads scoring in bulk, -1 for every core
+    """
+
+    def __init__(
+        self,
+        rows=(),
+        name_column="candidate_name",
+        id_column="candidate_id",
+        workers=-1,
+    ):
+        self.name_column = name_column
+        self.id_column = id_column
+        self.ids = []
+        self.names = []
+        self.workers = workers
+
+        # Token -> positions of the candidates with a name containing it
+        self.index = defaultdict(set)
+
+        for row in rows:
+            self.add(row)
+
+    def add(self, row):
+        """Indexes the candidate of the row"""
+
+        i = len(self.names)
+        name = normalize_name(getattr(row, self.name_column))
+
+        self.ids.append(getattr(row, self.id_column))
+        self.names.append(name)
+
+        for token in name.split():
+            self.index[token].add(i)
+
+    def block(self, name: str) -> frozenset[int]:
+        """
+        Candidates sharing a token with the name, whichever part of their name
+        it is, e.g. both Elizabeth Warren and Warren Davidson for "Warren", so
+        that a tie between them is still found. Initials are too common to
+        block on.
+        """
+
+        blocked = set()
+        for token in name.split():
+            if len(token) > 1:
+                blocked |= self.index.get(token, set())
+
+        return frozenset(blocked)
+
+    def _score(self, queries, block) -> list[dict[int, float]]:
+        """Scores the names sharing a block against its candidates only"""
+
+        columns = sorted(block)
+        matrix = process.cdist(
+            queries,
+            [self.names[c] for c in columns],
+            scorer=fuzz.token_set_ratio,
+            score_cutoff=REVIEW_THRESHOLD,
+            workers=self.workers,
+        )
+
+        # Scores under the cutoff are zeroed
+        return [
+            {columns[j]: float(scores[j]) for j in scores.nonzero()[0]}
+            for scores in matrix
+        ]
+
+    def match(self, names) -> dict[str, list[dict]]:
+        """
+        Returns the candidates of every name that could be matched:
+
+            MATCHED     one best candidate scoring at least MATCH_THRESHOLD
+            REVIEW      one best candidate scoring at least REVIEW_THRESHOLD
+            AMBIGUOUS   several candidates sharing the best score
+        """
+
+        names = list(dict.fromkeys(names))
+        normalized = [normalize_name(name) for name in names]
+
+        # Names with no candidate sharing a token, e.g. misspelled ones, are
+        # scored against every candidate
+        everyone = frozenset(range(len(self.names)))
+        by_block = defaultdict(list)
+        for i, name in enumerate(normalized):
+            by_block[self.block(name) or everyone].append(i)
+
+        scores = {}
+        for block, group in by_block.items():
+            if not block:
+                scores.update((i, {}) for i in group)
+                continue
+
+            group_scores = self._score([normalized[i] for i in group], block)
+            scores.update(zip(group, group_scores))
+
+        name_to_records = {}
+
+        for i, name in enumerate(names):
+            scored = scores[i]
+            best = max(scored.values(), default=0)
+
+            if best < REVIEW_THRESHOLD:
+                continue
+
+            tied = sorted(c for c, score in scored.items() if score == best)
+
+            if len(tied) > 1:
+                status = AMBIGUOUS
+            elif best >= MATCH_THRESHOLD:
+                status = MATCHED
+            else:
+                status = REVIEW
+
+            name_to_records[name] = [
+                {
+                    "candidate_id": self.ids[c],
+                    "match_status": status,
+                    "match_score": best,
+                }
+                for c in tied
+            ]
+
+        return name_to_records
@@ -0,0 +1,67 @@
+"""
+Creates the VSDB tables the loading pipeline writes to. Run once against a
+database, before the first load with --copy:
+
+    python -m ps_pipeline.load.migrate
+"""
+
+__author__ = "Johanan Tai"
+
+import os
+import argparse
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+
+MIGRATIONS_PATH = Path(__file__).parent.parent / "queries" / "migrations"
+
+
+def migrations() -> list[Path]:
+    """The migration files, in the order they are applied"""
+    return sorted(MIGRATIONS_PATH.glob("*.sql"))
+
+
+def migrate(connection) -> list[str]:
+    """
+    Applies every migration in one transaction. Migrations only create what
+    does not exist yet, so applying them again changes nothing.
+    """
+
+    applied = []
+
+    with connection.transaction():
+        cursor = connection.cursor()
+        for migration in migrations():
+            cursor.execute(migration.read_text(encoding="utf-8"))
+            applied.append(migration.stem)
+
+    return applied
+
+
+def main():
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(prog="ps_pipeline_migrate")
+    parser.parse_args()
+
+    import psycopg
+
+    vsdb_connection_info = {
+        "host": os.getenv("VSDB_HOST"),
+        "dbname": os.getenv("VSDB_DATABASE"),
+        "port": os.getenv("VSDB_PORT"),
+        "user": os.getenv("VSDB_USER"),
+        "password": os.getenv("VSDB_PASSWORD"),
+    }
+
+    with psycopg.connect(
+        **{k: v for k, v in vsdb_connection_info.items() if v}
+    ) as connection:
+        for name in migrate(connection):
+            print("Applied", name)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,34 +4,21 @@ General logic for the loading pipeline, matching persons and harvest file creati
 
 __author__ = "Johanan Tai"
 
+import json
+import asyncio
+import hashlib
+import functools
 from pathlib import Path
+from collections import Counter, defaultdict
 
-# External Packages & Libraries
-from rapidfuzz import fuzz
-from dateutil.parser import parse as datetimeparse
-from collections import defaultdict
-from record_matcher.matcher import RecordMatcher
-
+from ps_pipeline.dates import parse as datetimeparse, source_of
 from ps_pipeline.json_model import TransformedArticle
+from ps_pipeline.load import adb
+from ps_pipeline.load.cache import NameCache, QueryCache, roster_fingerprint
+from ps_pipeline.load.matcher import NameMatcher
 
 
-def query_as_records(query: str, connection, **params) -> dict[int, dict[str, str]]:
-    """Converts query results into records"""
-    cursor = connection.cursor()
-    cursor.execute(query, params)
-    headers = [str(k[0]) for k in cursor.description]
-    return {
-        index: dict(zip(headers, row)) for index, row in enumerate(cursor.fetchall())
-    }
-
-
-def query_as_reference(query: str, connection, **params) -> dict[str, int]:
-    """A two column query result that can be turn into a reference"""
-    cursor = connection.cursor()
-    cursor.execute(query, params)
-    return {name: ids for ids, name in cursor.fetchall()}
-
-
+@functools.lru_cache
 def load_query_string(filename: Path) -> str:
     """Reads from a .sql file to be executed"""
     package_dir = Path(__file__).parent.parent
@@ -41,97 +28,164 @@ def load_query_string(filename: Path) -> str:
     return query_string
 
 
-def match_records(records_x, records_y) -> dict[int, dict[str, str]]:
-
-    tb_matcher = RecordMatcher()
-    tb_matcher.x_records = records_x
-    tb_matcher.y_records = records_y
-
-    tb_config = tb_matcher.config
-    tb_config.scorers_by_column.SCORERS.update(
-        {
-            "token_set_ratio": lambda x, y: fuzz.token_set_ratio(
-                str(x).lower(), str(y.lower())
+def load_freshness_query(filename: Path) -> str | None:
+    """The query telling whether a cached result of the query is still fresh"""
+    package_dir = Path(__file__).parent.parent
+    if (package_dir / "queries" / f"{filename}-freshness.sql").exists():
+        return load_query_string(f"{filename}-freshness")
+    return None
+
+
+def harvest_key(harvest: dict) -> str:
+    """Stable key of a harvest row, over its candidates, speechtype, url and text"""
+
+    speechtext = harvest.get("speechtext") or ""
+    return hashlib.sha1(
+        json.dumps(
+            [
+                sorted(harvest.get("candidate_ids") or [], key=str),
+                harvest.get("speechtype_id"),
+                harvest.get("url"),
+                hashlib.sha1(speechtext.encode("utf-8")).hexdigest(),
+            ],
+            default=str,
+        ).encode("utf-8")
+    ).hexdigest()
+
+
+class References:
+    """Reference tables of VSDB, fetched once and shared by the candidates of a run"""
+
+    def __init__(self, matcher: NameMatcher, speechtypes: dict[str, int]):
+        self.matcher = matcher
+        self.speechtypes = speechtypes
+
+    @property
+    def fingerprint(self) -> str:
+        """Fingerprint of the candidate roster, see roster_fingerprint()"""
+        return roster_fingerprint(zip(self.matcher.ids, self.matcher.names))
+
+    @classmethod
+    def gather(cls, conninfo: str | None, query_cache: QueryCache = None):
+        """
+        Runs the reference queries concurrently, each over a connection of its
+        own. Without conninfo, the results are only read from the query cache.
+        """
+        return asyncio.run(cls._gather(conninfo, query_cache))
+
+    @classmethod
+    async def _gather(cls, conninfo, query_cache) -> "References":
+
+        async def candidates():
+            matcher = NameMatcher()
+
+            # The names are indexed while the next batch, or the other queries,
+            # are in flight, without the rows being kept
+            async for row in adb.stream(
+                conninfo,
+                load_query_string("office-candidates-active"),
+                query_cache,
+                load_freshness_query("office-candidates-active"),
+            ):
+                matcher.add(row)
+
+            return matcher
+
+        async def speechtypes():
+            _, rows = await adb.query(
+                conninfo,
+                load_query_string("speechtypes"),
+                query_cache,
+                load_freshness_query("speechtypes"),
             )
-        }
-    )
-    tb_config.scorers_by_column.default = "token_set_ratio"
-    tb_config.thresholds_by_column.default = 85
-
-    tb_config.populate()
-
-    tb_config.columns_to_match["name"] = "candidate_name"
-    tb_config.columns_to_get["candidate_id"] = "candidate_id"
-
-    tb_matcher.required_threshold = 80
-    tb_matcher.duplicate_threshold = 100
+            return adb.as_reference(rows)
 
-    # records_matched =
-    # {0: {name:..., candidate_id:..., 'match_status':...,  'row(s)_matched':..., 'match_score':...}}
-
-    records_matched, match_info = tb_matcher.match()
-    max_key_length = max(match_info, key=lambda x: len(x)) if match_info else 0
-
-    for k, v in match_info.items():
-        print(f"{k.rjust(len(max_key_length)+4)}:", v)
-
-    return records_matched
+        return cls(*await asyncio.gather(candidates(), speechtypes()))
 
 
 def match_json_names(
     articles_transformed: list[TransformedArticle],
-    vsdb_connection,
-) -> dict[str, dict[str, str]]:
+    references: References,
+    name_cache: NameCache = None,
+) -> dict[str, list[dict[str, str]]]:
+    """
+    The candidates of every attributed name of the articles. A name cache is
+    shared by the candidates loaded concurrently, so it is set to the roster of
+    the references once, before any of them, see NameCache.use_roster().
+    """
 
     unique_names = set()
 
     for article in articles_transformed:
         unique_names.update(article.nlp_extracts.all_attributed)
 
-    records_name = {i: {"name": name} for i, name in enumerate(unique_names)}
-    records_query = query_as_records(
-        load_query_string("office-candidates-active"), vsdb_connection
-    )
+    matcher = references.matcher
+    name_to_records = {}
+    new_names = unique_names
 
-    # records_matched =
-    # {0: {name:..., candidate_id:..., 'match_status':...,  'row(s)_matched':..., 'match_score':...}}
-    records_matched = match_records(records_name, records_query)
-
-    name_to_records = defaultdict(list)
-
-    for record in records_matched.values():
-        for i in record["row(s)_matched"].split(","):
-            name = record["name"]
-            if i:
-                record_query = records_query.get(int(i.strip()))
-                name_to_records[name].append(
-                    {
-                        "candidate_id": record_query.get("candidate_id"),
-                        "match_status": record.get("match_status"),
-                        "match_score": record.get("match_score"),
-                    }
-                )
+    # Only the names not resolved against the same roster before are matched
+    if name_cache is not None:
+        new_names = []
+
+        for name in unique_names:
+            resolved = name_cache.get(name)
+            if resolved is None:
+                new_names.append(name)
+            elif resolved:
+                name_to_records[name] = resolved
+
+    # name_to_records =
+    # {name: [{'candidate_id':..., 'match_status':..., 'match_score':...}, ...]}
+    matched = matcher.match(new_names)
+    name_to_records.update(matched)
+
+    if name_cache is not None:
+        for name in new_names:
+            name_cache.put(name, matched.get(name, []))
+
+    statuses = Counter(
+        records[0]["match_status"] for records in name_to_records.values()
+    )
+    for status, count in [
+        ("NAMES", len(unique_names)),
+        ("NEW NAMES", len(new_names)),
+        *statuses.most_common(),
+    ]:
+        print(f"{status.rjust(13)}:", count)
 
     return name_to_records
 
 
 def harvest_json(
     articles_transformed: list[TransformedArticle],
-    vsdb_connection,
+    references: References,
+    name_cache: NameCache = None,
+    loaded_urls: list = None,
 ):
+    """
+    Yields the harvest rows of the articles. The articles are iterated twice,
+    first for the names to match then for the rows, so that a JSONArrayReader
+    streams them from the file rather than holding them all.
 
-    name_to_records = match_json_names(articles_transformed, vsdb_connection)
-    speechtype_ref = query_as_reference(
-        load_query_string("speechtypes"), vsdb_connection
-    )
+    The urls of the harvested articles are appended to loaded_urls, so that
+    they need not be read a third time.
+    """
+
+    name_to_records = match_json_names(articles_transformed, references, name_cache)
+    speechtype_ref = references.speechtypes
 
     for article in articles_transformed:
 
+        if loaded_urls is not None:
+            loaded_urls.append(article.url)
+
         harvest_article = {
             "candidate_ids": None,
             "speechtype_id": None,
             "title": article.title,
-            "speechdate": datetimeparse(article.timestamp).strftime("%Y-%m-%d"),
+            "speechdate": datetimeparse(
+                article.timestamp, source_of(article.url)
+            ).strftime("%Y-%m-%d"),
             "location": article.publish_location,
             "url": article.url,
             "speechtext": None,
@@ -0,0 +1,196 @@
+"""
+Bulk loads harvest rows into VSDB, staging them through COPY and upserting them
+from the staging table in one statement.
+"""
+
+__author__ = "Johanan Tai"
+
+import os
+import json
+import hashlib
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+
+from ps_pipeline.load.pipe import load_query_string
+
+
+# Columns of the staging table, in the order rows are copied in
+HARVEST_COLUMNS = [
+    "url",
+    "candidate_id",
+    "speechtype_id",
+    "title",
+    "speechdate",
+    "location",
+    "speechtext",
+    "review",
+    "review_msg",
+]
+
+COPY_BATCH_SIZE = 5000
+
+HARVEST_TABLE = "speech_harvest"
+# Query file of the loaded rows checked for duplicates, see existing_harvest()
+EXISTING_QUERY = "harvest-existing"
+
+
+def harvest_rows(harvest_articles):
+    """One row per candidate of every harvest article, as a tuple of the columns"""
+
+    for harvest in harvest_articles:
+        for candidate_id in harvest.get("candidate_ids") or []:
+            yield tuple(
+                candidate_id if column == "candidate_id" else harvest.get(column)
+                for column in HARVEST_COLUMNS
+            )
+
+
+def harvest_table_exists(connection) -> bool:
+    # Without parameters, as the placeholder style differs between drivers
+    cursor = connection.cursor()
+    cursor.execute(f"SELECT to_regclass('{HARVEST_TABLE}')")
+    return cursor.fetchone()[0] is not None
+
+
+def copy_harvest(
+    harvest_articles, connection, batch_size=COPY_BATCH_SIZE
+) -> dict[str, int]:
+    """
+    Streams the harvest rows into a staging table in batches, then upserts them
+    by url, candidate and speechtype. Rows identical to the loaded ones are left
+    alone, so that loading the same harvest again changes nothing.
+
+    The harvest table is created once by python -m ps_pipeline.load.migrate.
+    """
+
+    if not harvest_table_exists(connection):
+        raise RuntimeError(
+            f"{HARVEST_TABLE} does not exist in VSDB, "
+            "create it with python -m ps_pipeline.load.migrate"
+        )
+
+    summary = {"staged": 0, "inserted": 0, "updated": 0, "unchanged": 0}
+    rows = harvest_rows(harvest_articles)
+    copy_query = f"COPY harvest_staging ({', '.join(HARVEST_COLUMNS)}) FROM STDIN"
+
+    with connection.transaction():
+        cursor = connection.cursor()
+        # The staging table outlives the transaction if it is nested in another
+        cursor.execute(load_query_string("harvest-staging"))
+        cursor.execute("TRUNCATE harvest_staging")
+
+        while batch := list(islice(rows, batch_size)):
+            with cursor.copy(copy_query) as copy:
+                for row in batch:
+                    copy.write_row(row)
+            summary["staged"] += len(batch)
+
+        cursor.execute(load_query_string("harvest-upsert"))
+        for (inserted,) in cursor.fetchall():
+            summary["inserted" if inserted else "updated"] += 1
+
+        cursor.execute(
+            "SELECT count(DISTINCT (url, candidate_id, speechtype_id)) "
+            "FROM harvest_staging"
+        )
+        (distinct,) = cursor.fetchone()
+
+    summary["unchanged"] = distinct - summary["inserted"] - summary["updated"]
+    return summary
+
+
+def text_hash(text) -> str:
+    """The hash of a speech text, as md5() computes it in VSDB"""
+    return hashlib.md5((text or "").encode("utf-8")).hexdigest()
+
+
+def existing_harvest(harvest_articles, connection, query=None) -> dict[tuple, str]:
+    """
+    The text hashes of the loaded rows sharing a url and candidate with the
+    harvest rows, by (url, candidate id, speechtype id), in one query.
+
+    The default query only sees the rows loaded into speech_harvest by
+    copy_harvest(). Speeches entered into VSDB otherwise are checked by setting
+    HARVEST_EXISTING_QUERY to a query file over their tables, which is given
+    the urls and candidate_ids arrays and returns the same columns.
+    """
+
+    query = query or os.getenv("HARVEST_EXISTING_QUERY") or EXISTING_QUERY
+
+    if query == EXISTING_QUERY and not harvest_table_exists(connection):
+        return {}
+
+    cursor = connection.cursor()
+    pairs = {(row[0], row[1]) for row in harvest_rows(harvest_articles)}
+    cursor.execute(
+        load_query_string(query),
+        {
+            "urls": [url for url, _ in pairs],
+            "candidate_ids": [candidate_id for _, candidate_id in pairs],
+        },
+    )
+    return {(url, c_id, st_id): h for url, c_id, st_id, h in cursor.fetchall()}
+
+
+def drop_existing(harvest_articles, connection) -> tuple[list[dict], dict[str, int]]:
+    """
+    Drops the harvest rows already loaded with the same text for every candidate,
+    and flags for review the ones loaded with a different text
+    """
+
+    existing = existing_harvest(harvest_articles, connection)
+    stats = {"existing": 0, "changed": 0}
+    kept = []
+
+    for harvest in harvest_articles:
+        url, speechtype_id = harvest.get("url"), harvest.get("speechtype_id")
+        loaded = [
+            existing.get((url, candidate_id, speechtype_id))
+            for candidate_id in harvest.get("candidate_ids") or []
+        ]
+        speech_hash = text_hash(harvest.get("speechtext"))
+
+        if loaded and all(h == speech_hash for h in loaded):
+            stats["existing"] += 1
+            continue
+
+        if any(h is not None and h != speech_hash for h in loaded):
+            stats["changed"] += 1
+            harvest = harvest | {
+                "review": True,
+                "review_msg": "This statement has changed since it was loaded.",
+            }
+
+        kept.append(harvest)
+
+    return kept, stats
+
+
+def drop_existing_stream(
+    harvest_articles, connection, stats: dict, batch_size=COPY_BATCH_SIZE
+):
+    """
+    drop_existing() over a stream of harvest rows, one batch at a time. The
+    counts of every batch are added to stats.
+    """
+
+    harvest_articles = iter(harvest_articles)
+
+    while batch := list(islice(harvest_articles, batch_size)):
+        kept, batch_stats = drop_existing(batch, connection)
+        for k, v in batch_stats.items():
+            stats[k] = stats.get(k, 0) + v
+
+        yield from kept
+
+
+def save_summary(summary: dict, export_path: Path, filename="") -> Path:
+    export_path.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.strftime(datetime.now(), "%Y-%m-%d-%H%M%S-%f")
+    filepath = export_path / f"{filename}LoadSummary_{timestamp}.json"
+
+    with open(filepath, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=4)
+
+    return filepath
@@ -0,0 +1,6 @@
+SELECT speech_harvest.url, speech_harvest.candidate_id, speech_harvest.speechtype_id,
+	md5(speech_harvest.speechtext) AS text_hash
+
+FROM speech_harvest
+JOIN unnest(%(urls)s::text[], %(candidate_ids)s::integer[]) AS batch (url, candidate_id)
+	USING (url, candidate_id)
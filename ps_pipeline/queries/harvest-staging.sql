@@ -0,0 +1,11 @@
+CREATE TEMP TABLE IF NOT EXISTS harvest_staging (
+	url text,
+	candidate_id integer,
+	speechtype_id integer,
+	title text,
+	speechdate date,
+	location text,
+	speechtext text,
+	review boolean,
+	review_msg text
+) ON COMMIT DROP
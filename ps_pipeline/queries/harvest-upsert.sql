@@ -0,0 +1,30 @@
+INSERT INTO speech_harvest (
+	url, candidate_id, speechtype_id,
+	title, speechdate, location, speechtext, review, review_msg
+)
+SELECT
+	DISTINCT ON (url, candidate_id, speechtype_id)
+	url, candidate_id, speechtype_id,
+	title, speechdate, location, speechtext, coalesce(review, false), review_msg
+
+FROM harvest_staging
+
+ORDER BY url, candidate_id, speechtype_id
+
+ON CONFLICT (url, candidate_id, speechtype_id) DO UPDATE SET
+	title = excluded.title,
+	speechdate = excluded.speechdate,
+	location = excluded.location,
+	speechtext = excluded.speechtext,
+	review = excluded.review,
+	review_msg = excluded.review_msg,
+	loaded_at = now()
+
+WHERE
+	(speech_harvest.title, speech_harvest.speechdate, speech_harvest.location,
+	 speech_harvest.speechtext, speech_harvest.review, speech_harvest.review_msg)
+	IS DISTINCT FROM
+	(excluded.title, excluded.speechdate, excluded.location,
+	 excluded.speechtext, excluded.review, excluded.review_msg)
+
+RETURNING (xmax = 0) AS inserted
@@ -0,0 +1,13 @@
+CREATE TABLE IF NOT EXISTS speech_harvest (
+	url text NOT NULL,
+	candidate_id integer NOT NULL,
+	speechtype_id integer NOT NULL,
+	title text,
+	speechdate date,
+	location text,
+	speechtext text,
+	review boolean NOT NULL DEFAULT false,
+	review_msg text,
+	loaded_at timestamptz NOT NULL DEFAULT now(),
+	PRIMARY KEY (url, candidate_id, speechtype_id)
+)
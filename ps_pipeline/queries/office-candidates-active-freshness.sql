@@ -0,0 +1,10 @@
+SELECT count(*), max(office_candidate.office_candidate_id), max(candidate.candidate_id)
+
+FROM office_candidate
+JOIN candidate USING (candidate_id)
+JOIN officecandidatestatus USING (officecandidatestatus_id)
+
+WHERE
+	office_candidate.office_id IN (1,5,6)
+	AND
+	officecandidatestatus.name = 'active'
@@ -0,0 +1,2 @@
+SELECT count(*), max(speechtype_id)
+FROM speechtype
@@ -0,0 +1,188 @@
+"""
+Declared schemas of the pipeline records, compiled into validators that check
+the JSON elements before any work is spent on them.
+"""
+
+__author__ = "Johanan Tai"
+
+import functools
+from pathlib import Path
+from dataclasses import dataclass
+from datetime import datetime
+
+from ps_pipeline.dates import parse as datetimeparse
+from ps_pipeline.json_model import (
+    JSONRecord,
+    Article,
+    TransformedArticle,
+    NLPExtract,
+    HarvestArticle,
+    dump_stream,
+)
+
+
+def _is_datetime(value) -> str | None:
+    try:
+        datetimeparse(value)
+    except ValueError:
+        return f"unparsable datetime {value!r}"
+    return None
+
+
+def _is_not_blank(value) -> str | None:
+    return None if value.strip() else "blank text"
+
+
+@dataclass(frozen=True)
+class Field:
+    types: tuple[type, ...]
+    required: bool = False
+    check: callable = None
+    # Record type of the elements of a list field
+    items: type = None
+
+
+SCHEMAS = {
+    Article: {
+        "title": Field((str,), required=True),
+        "source_url": Field((str,), required=True),
+        "publish_time": Field((str,), required=True, check=_is_datetime),
+        "publish_location": Field((str,)),
+        "raw_text": Field((str,), required=True, check=_is_not_blank),
+        "article_type": Field((str,)),
+        "article_tags": Field((list,)),
+        "web_candidate_id": Field((str, int)),
+    },
+    TransformedArticle: {
+        "article_title": Field((str,)),
+        "article_timestamp": Field((str,), required=True, check=_is_datetime),
+        "article_url": Field((str,), required=True),
+        "article_text": Field((str,)),
+        "publish_location": Field((str,)),
+        "statements": Field((list,), items=NLPExtract),
+    },
+    NLPExtract: {
+        "attributed": Field((str,), required=True),
+        "text": Field((str,), required=True),
+        "text_type": Field((str,)),
+        "classification": Field((str,)),
+    },
+    HarvestArticle: {
+        "candidate_ids": Field((list,), required=True),
+        "speechtype_id": Field((int,)),
+        "title": Field((str,)),
+        "speechdate": Field((str,), required=True, check=_is_datetime),
+        "location": Field((str,)),
+        "url": Field((str,), required=True),
+        "speechtext": Field((str,), required=True),
+        "review": Field((bool,)),
+        "review_msg": Field((str,)),
+    },
+}
+
+
+def _compile_field(key, spec: Field):
+    """A check of one key, returning the reasons the value is invalid"""
+
+    item_validator = validator(spec.items) if spec.items else None
+
+    def check(element: dict) -> list[str]:
+        value = element.get(key)
+
+        if value is None:
+            return [f"{key}: missing"] if spec.required else []
+
+        # bool is a subclass of int, which should not pass as one
+        if not isinstance(value, spec.types) or (
+            isinstance(value, bool) and bool not in spec.types
+        ):
+            return [f"{key}: expected {spec.types[0].__name__}"]
+
+        if spec.check is not None:
+            reason = spec.check(value)
+            if reason:
+                return [f"{key}: {reason}"]
+
+        if item_validator is not None:
+            return [
+                f"{key}[{i}] {reason}"
+                for i, item in enumerate(value)
+                for reason in item_validator(item)
+            ]
+
+        return []
+
+    return check
+
+
+@functools.cache
+def validator(record_type: type):
+    """
+    Compiles the schema of the record type once, into a function that returns
+    the reasons an element is invalid, an empty list if it is valid.
+    """
+
+    checks = [_compile_field(key, spec) for key, spec in SCHEMAS[record_type].items()]
+
+    def validate(element) -> list[str]:
+        if not isinstance(element, dict):
+            return [f"expected an object, got {type(element).__name__}"]
+
+        return [reason for check in checks for reason in check(element)]
+
+    return validate
+
+
+class Quarantine:
+    """Invalid elements, kept along with the reasons they were rejected"""
+
+    def __init__(self):
+        self.records = []
+        # (source, position) of the quarantined elements
+        self.keys = set()
+
+    def __len__(self):
+        return len(self.records)
+
+    def add(self, element, reasons: list[str], source=None, position=None):
+        # Elements read again by a later pass over the same source are kept once
+        if position is not None:
+            if (source, position) in self.keys:
+                return
+            self.keys.add((source, position))
+
+        self.records.append({"source": source, "reasons": reasons, "record": element})
+
+    def filter(self, elements, record_type: type, source=None):
+        """
+        Yields the valid elements as records, quarantining the rest. Elements
+        are told apart by their position in the source, so that passing the
+        same source again quarantines nothing new.
+        """
+
+        validate = validator(record_type)
+
+        for position, element in enumerate(elements):
+            if isinstance(element, JSONRecord):
+                element = element.to_dict()
+
+            reasons = validate(element)
+
+            if reasons:
+                self.add(element, reasons, source, position)
+                continue
+
+            yield record_type.from_dict(element)
+
+    def save(self, export_path: Path, filename="") -> Path | None:
+        if not self.records:
+            return None
+
+        export_path.mkdir(parents=True, exist_ok=True)
+        timestamp = datetime.strftime(datetime.now(), "%Y-%m-%d-%H%M%S-%f")
+        filepath = export_path / f"{filename}Quarantine_{timestamp}.json"
+
+        with open(filepath, "wb") as f:
+            dump_stream(self.records, f)
+
+        return filepath
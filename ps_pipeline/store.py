@@ -0,0 +1,459 @@
+"""
+Module to keep the articles of every stage in an embedded SQLite database,
+alongside the JSON files the stages write.
+"""
+
+__author__ = "Johanan Tai"
+
+import os
+import json
+import sqlite3
+import hashlib
+from pathlib import Path
+from datetime import datetime
+
+from ps_pipeline.dates import parse_or_none
+from ps_pipeline.json_model import (
+    Article,
+    Articles,
+    TransformedArticle,
+    TransformedArticles,
+    HarvestArticle,
+    HarvestArticles,
+)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    candidate_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    title TEXT,
+    publish_time TEXT,
+    published_at TEXT,
+    publish_location TEXT,
+    raw_text TEXT,
+    article_type TEXT,
+    article_tags TEXT,
+    web_candidate_id TEXT,
+    content_hash TEXT,
+    collected_at TEXT NOT NULL,
+    PRIMARY KEY (candidate_id, url)
+);
+CREATE INDEX IF NOT EXISTS articles_published_at
+    ON articles (candidate_id, published_at);
+CREATE INDEX IF NOT EXISTS articles_content_hash ON articles (content_hash);
+
+CREATE TABLE IF NOT EXISTS transformed_articles (
+    candidate_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    title TEXT,
+    timestamp TEXT,
+    published_at TEXT,
+    text TEXT,
+    publish_location TEXT,
+    content_hash TEXT,
+    transformed_at TEXT NOT NULL,
+    loaded_at TEXT,
+    PRIMARY KEY (candidate_id, url)
+);
+CREATE INDEX IF NOT EXISTS transformed_articles_published_at
+    ON transformed_articles (candidate_id, published_at);
+CREATE INDEX IF NOT EXISTS transformed_articles_loaded_at
+    ON transformed_articles (candidate_id, loaded_at);
+CREATE INDEX IF NOT EXISTS transformed_articles_content_hash
+    ON transformed_articles (content_hash);
+
+CREATE TABLE IF NOT EXISTS transformed_statements (
+    candidate_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    attributed TEXT,
+    text TEXT,
+    text_type TEXT,
+    classification TEXT,
+    PRIMARY KEY (candidate_id, url, position),
+    FOREIGN KEY (candidate_id, url)
+        REFERENCES transformed_articles (candidate_id, url) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS harvest (
+    candidate_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    speechtype_id INTEGER,
+    candidate_ids TEXT NOT NULL,
+    title TEXT,
+    speechdate TEXT,
+    location TEXT,
+    speechtext TEXT,
+    review INTEGER,
+    review_msg TEXT,
+    content_hash TEXT,
+    harvested_at TEXT NOT NULL,
+    PRIMARY KEY (candidate_id, url, speechtype_id, candidate_ids)
+);
+CREATE INDEX IF NOT EXISTS harvest_speechdate ON harvest (candidate_id, speechdate);
+CREATE INDEX IF NOT EXISTS harvest_content_hash ON harvest (content_hash);
+"""
+
+
+def content_hash(text) -> str | None:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest() if text else None
+
+
+def _isoformat(timestamp) -> str | None:
+    """Normalized publish time, so that it sorts and compares in SQL"""
+    published = parse_or_none(timestamp)
+    return published.isoformat() if published else None
+
+
+class ArticleStore:
+    """
+    Articles, transformed statements and harvest rows keyed by candidate and url.
+    Writes are upserts, done in bulk within a transaction.
+    """
+
+    def __init__(self, db_path: Path):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.connection = sqlite3.connect(db_path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    # ===============
+    #     EXTRACT
+    # ===============
+    def upsert_articles(self, candidate_id, articles: list[Article]) -> int:
+        collected_at = datetime.now().isoformat()
+
+        rows = [
+            {
+                "candidate_id": str(candidate_id),
+                "url": article.url,
+                "title": article.title,
+                "publish_time": article.timestamp,
+                "published_at": _isoformat(article.timestamp),
+                "publish_location": article.publish_location,
+                "raw_text": article.text,
+                "article_type": article.type,
+                "article_tags": json.dumps(article.tags),
+                "web_candidate_id": article.web_id,
+                "content_hash": content_hash(article.text),
+                "collected_at": collected_at,
+            }
+            for article in articles
+            if article.url
+        ]
+
+        with self.connection:
+            self.connection.executemany(
+                """
+                INSERT INTO articles VALUES (
+                    :candidate_id, :url, :title, :publish_time, :published_at,
+                    :publish_location, :raw_text, :article_type, :article_tags,
+                    :web_candidate_id, :content_hash, :collected_at
+                )
+                ON CONFLICT (candidate_id, url) DO UPDATE SET
+                    title = excluded.title,
+                    publish_time = excluded.publish_time,
+                    published_at = excluded.published_at,
+                    publish_location = excluded.publish_location,
+                    raw_text = excluded.raw_text,
+                    article_type = excluded.article_type,
+                    article_tags = excluded.article_tags,
+                    web_candidate_id = excluded.web_candidate_id,
+                    content_hash = excluded.content_hash,
+                    collected_at = excluded.collected_at
+                WHERE excluded.content_hash IS NOT articles.content_hash
+                """,
+                rows,
+            )
+
+        return len(rows)
+
+    @staticmethod
+    def _article(row) -> Article:
+        return Article.from_dict(
+            dict(row)
+            | {
+                "source_url": row["url"],
+                "article_tags": json.loads(row["article_tags"] or "null"),
+            }
+        )
+
+    def articles(self, candidate_id, since: datetime = None) -> Articles:
+        """Articles in the JSON shape of the extract files, oldest first"""
+
+        cursor = self.connection.execute(
+            """
+            SELECT * FROM articles
+            WHERE candidate_id = ? AND (? IS NULL OR published_at > ?)
+            ORDER BY published_at
+            """,
+            (str(candidate_id), *[since.isoformat() if since else None] * 2),
+        )
+        return Articles([self._article(row) for row in cursor])
+
+    def has_articles(self, candidate_id) -> bool:
+        return (
+            self.connection.execute(
+                "SELECT 1 FROM articles WHERE candidate_id = ? LIMIT 1",
+                (str(candidate_id),),
+            ).fetchone()
+            is not None
+        )
+
+    def latest(self, candidate_id) -> datetime | None:
+        (latest,) = self.connection.execute(
+            "SELECT MAX(published_at) FROM articles WHERE candidate_id = ?",
+            (str(candidate_id),),
+        ).fetchone()
+        return datetime.fromisoformat(latest) if latest else None
+
+    def urls(self, candidate_id) -> set[str]:
+        cursor = self.connection.execute(
+            "SELECT url FROM articles WHERE candidate_id = ?", (str(candidate_id),)
+        )
+        return {url for (url,) in cursor}
+
+    def pending_transform(self, candidate_id) -> Articles:
+        """Articles that have not been transformed since they last changed"""
+
+        cursor = self.connection.execute(
+            """
+            SELECT a.* FROM articles a
+            LEFT JOIN transformed_articles t
+                ON t.candidate_id = a.candidate_id AND t.url = a.url
+            WHERE a.candidate_id = ?
+                AND (t.url IS NULL OR t.transformed_at < a.collected_at)
+            ORDER BY a.published_at DESC
+            """,
+            (str(candidate_id),),
+        )
+        return Articles([self._article(row) for row in cursor])
+
+    # ===============
+    #    TRANSFORM
+    # ===============
+    def upsert_transformed(
+        self, candidate_id, transformed: list[TransformedArticle]
+    ) -> int:
+        candidate_id = str(candidate_id)
+        transformed_at = datetime.now().isoformat()
+
+        rows = []
+        statements = []
+
+        for article in transformed:
+            if not article.url:
+                continue
+
+            rows.append(
+                {
+                    "candidate_id": candidate_id,
+                    "url": article.url,
+                    "title": article.title,
+                    "timestamp": article.timestamp,
+                    "published_at": _isoformat(article.timestamp),
+                    "text": article.text,
+                    "publish_location": article.publish_location,
+                    "content_hash": content_hash(article.text),
+                    "transformed_at": transformed_at,
+                }
+            )
+            statements.extend(
+                {
+                    "candidate_id": candidate_id,
+                    "url": article.url,
+                    "position": position,
+                    "attributed": extract.attributed,
+                    "text": extract.text,
+                    "text_type": extract.text_type,
+                    "classification": extract.classification,
+                }
+                for position, extract in enumerate(article.nlp_extracts.all)
+            )
+
+        with self.connection:
+            self.connection.executemany(
+                """
+                INSERT INTO transformed_articles VALUES (
+                    :candidate_id, :url, :title, :timestamp, :published_at, :text,
+                    :publish_location, :content_hash, :transformed_at, NULL
+                )
+                ON CONFLICT (candidate_id, url) DO UPDATE SET
+                    title = excluded.title,
+                    timestamp = excluded.timestamp,
+                    published_at = excluded.published_at,
+                    text = excluded.text,
+                    publish_location = excluded.publish_location,
+                    content_hash = excluded.content_hash,
+                    transformed_at = excluded.transformed_at,
+                    loaded_at = NULL
+                """,
+                rows,
+            )
+            # Statements of a transformed article are replaced as a whole
+            self.connection.executemany(
+                """
+                DELETE FROM transformed_statements
+                WHERE candidate_id = :candidate_id AND url = :url
+                """,
+                rows,
+            )
+            self.connection.executemany(
+                """
+                INSERT INTO transformed_statements VALUES (
+                    :candidate_id, :url, :position, :attributed, :text,
+                    :text_type, :classification
+                )
+                """,
+                statements,
+            )
+
+        return len(rows)
+
+    def _transformed(self, candidate_id, where, params) -> TransformedArticles:
+        rows = self.connection.execute(
+            f"""
+            SELECT * FROM transformed_articles
+            WHERE candidate_id = ? AND {where}
+            ORDER BY published_at DESC
+            """,
+            (str(candidate_id), *params),
+        ).fetchall()
+
+        statements = {}
+        for statement in self.connection.execute(
+            f"""
+            SELECT s.* FROM transformed_statements s
+            JOIN transformed_articles t USING (candidate_id, url)
+            WHERE t.candidate_id = ? AND {where}
+            ORDER BY s.url, s.position
+            """,
+            (str(candidate_id), *params),
+        ):
+            statements.setdefault(statement["url"], []).append(dict(statement))
+
+        return TransformedArticles(
+            [
+                {
+                    "article_title": row["title"],
+                    "article_timestamp": row["timestamp"],
+                    "article_url": row["url"],
+                    "article_text": row["text"],
+                    "publish_location": row["publish_location"],
+                    "statements": statements.get(row["url"], []),
+                }
+                for row in rows
+            ]
+        )
+
+    def transformed(self, candidate_id, since: datetime = None) -> TransformedArticles:
+        """Transformed articles in the JSON shape of the transformed files"""
+        since = since.isoformat() if since else None
+        return self._transformed(
+            candidate_id, "(? IS NULL OR published_at > ?)", (since, since)
+        )
+
+    def pending_load(self, candidate_id) -> TransformedArticles:
+        """Transformed articles that have not been loaded since they changed"""
+        return self._transformed(candidate_id, "loaded_at IS NULL", ())
+
+    # ===============
+    #      LOAD
+    # ===============
+    def upsert_harvest(self, candidate_id, harvest: list[HarvestArticle]) -> int:
+        candidate_id = str(candidate_id)
+        harvested_at = datetime.now().isoformat()
+
+        # The harvest may be streamed, e.g. from a JSONArrayReader
+        rows = (
+            {
+                "candidate_id": candidate_id,
+                "url": h.url,
+                "speechtype_id": h.speechtype_id,
+                "candidate_ids": json.dumps(h.candidate_ids),
+                "title": h.title,
+                "speechdate": h.speechdate,
+                "location": h.location,
+                "speechtext": h.speechtext,
+                "review": h.review,
+                "review_msg": h.review_message,
+                "content_hash": content_hash(h.speechtext),
+                "harvested_at": harvested_at,
+            }
+            for h in harvest
+        )
+
+        with self.connection:
+            cursor = self.connection.executemany(
+                """
+                INSERT INTO harvest VALUES (
+                    :candidate_id, :url, :speechtype_id, :candidate_ids, :title,
+                    :speechdate, :location, :speechtext, :review, :review_msg,
+                    :content_hash, :harvested_at
+                )
+                ON CONFLICT (candidate_id, url, speechtype_id, candidate_ids)
+                DO UPDATE SET
+                    title = excluded.title,
+                    speechdate = excluded.speechdate,
+                    location = excluded.location,
+                    speechtext = excluded.speechtext,
+                    review = excluded.review,
+                    review_msg = excluded.review_msg,
+                    content_hash = excluded.content_hash,
+                    harvested_at = excluded.harvested_at
+                """,
+                rows,
+            )
+
+        return cursor.rowcount
+
+    def mark_loaded(self, candidate_id, urls):
+        loaded_at = datetime.now().isoformat()
+
+        with self.connection:
+            self.connection.executemany(
+                """
+                UPDATE transformed_articles SET loaded_at = ?
+                WHERE candidate_id = ? AND url = ?
+                """,
+                [(loaded_at, str(candidate_id), url) for url in urls],
+            )
+
+    def harvest(self, candidate_id) -> HarvestArticles:
+        """Harvest rows in the JSON shape of the harvest files"""
+
+        cursor = self.connection.execute(
+            "SELECT * FROM harvest WHERE candidate_id = ? ORDER BY speechdate DESC",
+            (str(candidate_id),),
+        )
+        return HarvestArticles(
+            [
+                dict(row)
+                | {
+                    "candidate_ids": json.loads(row["candidate_ids"]),
+                    "review": bool(row["review"]),
+                }
+                for row in cursor
+            ]
+        )
+
+
+def open_store() -> ArticleStore | None:
+    """The store at PIPELINE_DATABASE, when it is configured"""
+
+    db_path = os.getenv("PIPELINE_DATABASE")
+    return ArticleStore(Path(db_path)) if db_path else None
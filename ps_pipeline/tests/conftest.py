@@ -3,12 +3,10 @@ import json
 from pathlib import Path
 
 import pytest
-import spacy
 from dotenv import load_dotenv
 from unidecode import unidecode
 
-from ps_pipeline.transform import pipe as t_pipe
-from ps_pipeline.json_model import Articles
+from ps_pipeline.json_model import Articles, json_files, read_json
 
 
 load_dotenv()
@@ -18,13 +16,11 @@ def read_extract_file(candidate_id):
     data_directory = Path(os.getenv("DATA_FILES_DIRECTORY"))
 
     extract_path = data_directory / str(candidate_id) / "EXTRACT_FILES"
-    extract_files = filter(lambda f: f.name.endswith(".json"), extract_path.iterdir())
 
     data = []
 
-    for file in sorted(extract_files, key=lambda f: f.stat().st_mtime):
-        with open(file, "r", encoding="utf-8") as f:
-            data += json.load(f)
+    for file in json_files(extract_path):
+        data += read_json(file)
 
     articles = Articles(data)
     source_to_texts = {(candidate_id, a.url): a.text for a in articles.all}
@@ -45,6 +41,23 @@ def read_test_data(filename):
     return source_to_expected
 
 
+def load_attributed_statements_nlp():
+    # spaCy and the transformer model are only imported by the tests using them
+    import spacy
+    from ps_pipeline.transform import pipe as t_pipe
+
+    t_pipe.nlp_articles.register()
+    t_pipe.nlp_attributed_statements.register()
+
+    nlp_model = spacy.load("en_core_web_trf")
+    nlp_model.add_pipe("sentencizer", before="parser")
+    nlp_model.add_pipe("set_midquote_as_combined_sentence", after="sentencizer")
+    nlp_model.add_pipe(
+        "set_newline_as_sentence_start", after="set_midquote_as_combined_sentence"
+    )
+    return nlp_model
+
+
 def docs_to_expected_test_data(test_data: dict, nlp):
 
     docs_to_expected = []
@@ -65,16 +78,7 @@ def docs_to_expected_test_data(test_data: dict, nlp):
 
 @pytest.fixture(scope="module")
 def nlp_attributed_statements():
-    t_pipe.nlp_articles.register()
-    t_pipe.nlp_attributed_statements.register()
-
-    nlp_model = spacy.load("en_core_web_trf")
-    nlp_model.add_pipe("sentencizer", before="parser")
-    nlp_model.add_pipe("set_midquote_as_combined_sentence", after="sentencizer")
-    nlp_model.add_pipe(
-        "set_newline_as_sentence_start", after="set_midquote_as_combined_sentence"
-    )
-    return nlp_model
+    return load_attributed_statements_nlp()
 
 
 @pytest.fixture(scope="module")
@@ -93,16 +97,7 @@ def docs_to_expected_attributed_statements(
 
 def main():
     test_data = read_test_data("attributed_statements.json")
-
-    t_pipe.nlp_articles.register()
-    t_pipe.nlp_attributed_statements.register()
-
-    nlp_model = spacy.load("en_core_web_trf")
-    nlp_model.add_pipe("sentencizer", before="parser")
-    nlp_model.add_pipe("set_midquote_as_combined_sentence", after="sentencizer")
-    nlp_model.add_pipe(
-        "set_newline_as_sentence_start", after="set_midquote_as_combined_sentence"
-    )
+    nlp_model = load_attributed_statements_nlp()
 
     docs_to_expected = docs_to_expected_test_data(test_data, nlp_model)
 
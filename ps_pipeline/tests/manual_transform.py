@@ -6,7 +6,7 @@ from dotenv import load_dotenv
 from spacy.tokens import Doc
 from spacy.language import Language
 from ps_pipeline.transform import pipe as t_pipe
-from ps_pipeline.json_model import Articles
+from ps_pipeline.json_model import Articles, json_files, read_json
 from ps_pipeline.tests.str_format import ansiscape, insert_format
 
 
@@ -205,7 +205,6 @@ def main(args):
     load_dotenv()
 
     data_directory = Path(os.getenv("DATA_FILES_DIRECTORY"))
-    import json
 
     if args.candidate_id is None or args.url is None:
         print("Both candidate ID and URL are required.")
@@ -213,13 +212,11 @@ def main(args):
         return
 
     extract_path = data_directory / args.candidate_id / "EXTRACT_FILES"
-    extract_files = filter(lambda f: f.name.endswith(".json"), extract_path.iterdir())
 
     data = []
 
-    for file in sorted(extract_files, key=lambda f: f.stat().st_mtime):
-        with open(file, "r") as f:
-            data += json.load(f)
+    for file in json_files(extract_path):
+        data += read_json(file)
 
     articles = Articles(data)
 
@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from ps_pipeline import dates
+from ps_pipeline.dates import comparable, find_date, parse, parse_many, source_of
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("2024-01-02", datetime(2024, 1, 2)),
+        ("2024-01-02T10:30:00", datetime(2024, 1, 2, 10, 30)),
+        (
+            "2024-01-02T10:30:00-05:00",
+            datetime(2024, 1, 2, 10, 30, tzinfo=timezone(timedelta(hours=-5))),
+        ),
+        ("January 2, 2024", datetime(2024, 1, 2)),
+        ("Jan. 2, 2024", datetime(2024, 1, 2)),
+        ("Tuesday, January 2, 2024", datetime(2024, 1, 2)),
+        ("01/02/2024", datetime(2024, 1, 2)),
+        ("01.02.24", datetime(2024, 1, 2)),
+        ("2 January 2024", datetime(2024, 1, 2)),
+        (
+            "Tue, 02 Jan 2024 10:30:00 +0000",
+            datetime(2024, 1, 2, 10, 30, tzinfo=timezone.utc),
+        ),
+        # Feeds spell the zone out, which strptime would leave naive
+        (
+            "Tue, 02 Jan 2024 10:30:00 GMT",
+            datetime(2024, 1, 2, 10, 30, tzinfo=timezone.utc),
+        ),
+        (
+            "Tue, 02 Jan 2024 10:30:00 UTC",
+            datetime(2024, 1, 2, 10, 30, tzinfo=timezone.utc),
+        ),
+        ("  January 2, 2024\n", datetime(2024, 1, 2)),
+    ],
+)
+def test_parse(text, expected):
+    parsed = parse(text)
+
+    assert parsed == expected
+    assert parsed.tzinfo == expected.tzinfo
+
+
+@pytest.mark.parametrize("text", ["", "   ", None])
+def test_parse_empty(text):
+    with pytest.raises(ValueError):
+        parse(text)
+
+
+def test_learned_format_of_a_source(monkeypatch):
+    source = source_of("https://www.example.gov/news/1")
+    assert source == "www.example.gov"
+
+    parse("Tue, 02 Jan 2024 10:30:00 GMT", source)
+    assert dates._source_formats[source] == "%a, %d %b %Y %H:%M:%S GMT"
+
+    # Later dates of the source take the fast path, without the generic parser
+    monkeypatch.setattr(dates, "_parse", None)
+    assert parse("Wed, 03 Jan 2024 08:00:00 GMT", source) == datetime(
+        2024, 1, 3, 8, tzinfo=timezone.utc
+    )
+
+
+def test_parse_many_parses_distinct_strings_once(monkeypatch):
+    calls = []
+    parse_or_none = dates.parse_or_none
+
+    def counted(text, source=None):
+        calls.append(text)
+        return parse_or_none(text, source)
+
+    monkeypatch.setattr(dates, "parse_or_none", counted)
+
+    texts = ["January 2, 2024", "01/03/2024", "January 2, 2024", "not a date"]
+    assert parse_many(texts) == [
+        datetime(2024, 1, 2),
+        datetime(2024, 1, 3),
+        datetime(2024, 1, 2),
+        None,
+    ]
+    assert calls == ["January 2, 2024", "01/03/2024", "not a date"]
+
+
+def test_comparable():
+    naive = datetime(2024, 1, 2, 12)
+    aware = datetime(2024, 1, 2, 10, tzinfo=timezone(timedelta(hours=-5)))
+
+    # Aware datetimes are compared in time, mixed ones by wall clock
+    assert comparable(aware, aware.astimezone(timezone.utc)) == (
+        aware,
+        aware.astimezone(timezone.utc),
+    )
+    assert max(comparable(naive, aware)) == naive
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("2024-01-02", "2024-01-02 00:00:00"),
+        ("Posted 01/02/2024 by the press office", "2024-01-02 00:00:00"),
+        ("Updated 01.02.24", "2024-01-02 00:00:00"),
+        ("Washington, January 02, 2024", "2024-01-02 00:00:00"),
+        ("Jan 02 2024 | Press Release", "2024-01-02 00:00:00"),
+        # Numeric dates are preferred over spelled out ones
+        ("January 02, 2024, updated 01/05/2024", "2024-01-05 00:00:00"),
+        ("No date here", "No date here"),
+        # Not a month, so the text is returned as it is
+        ("Smarch 02, 2024", "Smarch 02, 2024"),
+    ],
+)
+def test_find_date(text, expected):
+    assert find_date(text) == expected
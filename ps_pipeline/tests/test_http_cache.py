@@ -0,0 +1,110 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ps_pipeline.extract.web.http_cache import HTTPCache
+
+
+BODY = "<html><body>Article</body></html>"
+
+
+class Handler(BaseHTTPRequestHandler):
+    # Set per server: the validators sent, and whether they are honored
+    validators = {}
+    conditional = True
+
+    def do_HEAD(self):
+        self.server.requests.append((self.command, dict(self.headers)))
+
+        etag = self.validators.get("ETag")
+        if self.conditional and etag and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+        else:
+            self.send_response(200)
+            for header, value in self.validators.items():
+                self.send_header(header, value)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def serve(validators, conditional=True):
+        handler = type(
+            "Handler",
+            (Handler,),
+            {"validators": validators, "conditional": conditional},
+        )
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        server.requests = []
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server, f"http://127.0.0.1:{server.server_port}/article"
+
+    yield serve
+
+    for server in servers:
+        server.shutdown()
+
+
+def load(http_cache, url):
+    """What get_page_source does around the driver, returns whether it loaded"""
+
+    body, validators = http_cache.revalidate(url)
+    if body is not None:
+        return False
+
+    http_cache.store(url, BODY, validators)
+    return True
+
+
+@pytest.mark.parametrize(
+    "validators, conditional",
+    [
+        ({"ETag": '"v1"'}, True),
+        ({"Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}, False),
+        # Answers 200 whatever the conditional headers, with the same ETag
+        ({"ETag": '"v1"'}, False),
+    ],
+)
+def test_loaded_once_then_hit(tmp_path, serve, validators, conditional):
+    server, url = serve(validators, conditional)
+    http_cache = HTTPCache(tmp_path)
+
+    assert load(http_cache, url)
+    assert not load(http_cache, url)
+    assert not load(http_cache, url)
+
+    assert http_cache.stats["hits"] == 2 and http_cache.stats["misses"] == 1
+    # Validators are recorded on the first load, and sent from then on
+    assert "If-None-Match" not in server.requests[0][1]
+    if "ETag" in validators:
+        assert server.requests[1][1]["If-None-Match"] == '"v1"'
+
+
+def test_changed_page_loaded_again(tmp_path, serve):
+    server, url = serve({"ETag": '"v1"'})
+    http_cache = HTTPCache(tmp_path)
+
+    assert load(http_cache, url)
+    server.RequestHandlerClass.validators = {"ETag": '"v2"'}
+    assert load(http_cache, url)
+
+    assert http_cache.entry(url)["etag"] == '"v2"'
+    assert not load(http_cache, url)
+
+
+def test_no_request_without_validators(tmp_path, serve):
+    server, url = serve({})
+    http_cache = HTTPCache(tmp_path)
+
+    assert load(http_cache, url)
+    assert load(http_cache, url)
+
+    # Only the first load asks for validators, as there are none to revalidate
+    assert len(server.requests) == 1
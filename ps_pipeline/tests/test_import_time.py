@@ -0,0 +1,52 @@
+import sys
+import time
+import subprocess
+
+import pytest
+
+
+# Seconds a stage entry point may take to print its help
+STARTUP_BUDGET = 1.0
+
+ENTRY_POINTS = [
+    "ps_pipeline.extract",
+    "ps_pipeline.transform",
+    "ps_pipeline.load",
+]
+
+# Dependencies only the compute paths of the stages should import
+HEAVY_MODULES = [
+    "spacy",
+    "selenium",
+    "bs4",
+    "psycopg",
+    "rapidfuzz",
+    "numpy",
+    "dateutil",
+]
+
+
+@pytest.mark.parametrize("entry_point", ENTRY_POINTS)
+def test_entry_point_imports_no_heavy_modules(entry_point):
+    code = (
+        "import sys\n"
+        f"import {entry_point}.__main__\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+
+    assert result.stdout.strip() == ""
+
+
+@pytest.mark.parametrize("entry_point", ENTRY_POINTS)
+def test_entry_point_help_within_budget(entry_point):
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-m", entry_point, "--help"],
+        capture_output=True,
+        check=True,
+    )
+
+    assert time.perf_counter() - start < STARTUP_BUDGET
@@ -0,0 +1,131 @@
+import sqlite3
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+import pytest
+
+from ps_pipeline.json_model import HarvestArticle, TransformedArticles
+from ps_pipeline.json_reader import JSONArrayReader
+from ps_pipeline.load.__main__ import load_candidates
+from ps_pipeline.load.cache import NameCache
+from ps_pipeline.load.matcher import NameMatcher
+from ps_pipeline.load.pipe import References
+from ps_pipeline.schema import Quarantine
+
+
+Candidate = namedtuple("Candidate", ["candidate_id", "candidate_name"])
+
+SPEECHTYPES = {"Press Release": 5, "Other": 9}
+
+
+class SQLitePool:
+    """Stand-in for a psycopg_pool.ConnectionPool, over one SQLite file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.opened = 0
+        self.in_use = 0
+
+    @contextmanager
+    def connection(self):
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        # Answers what Postgres' to_regclass would, for the tables of the file
+        connection.create_function(
+            "to_regclass",
+            1,
+            lambda name: (
+                connection.execute(
+                    "SELECT name FROM sqlite_master WHERE name = ?", (name,)
+                ).fetchone()
+                or (None,)
+            )[0],
+        )
+
+        with self.lock:
+            self.opened += 1
+            self.in_use += 1
+        try:
+            yield connection
+        finally:
+            with self.lock:
+                self.in_use -= 1
+            connection.close()
+
+
+def transformed(candidate_name, urls):
+    return TransformedArticles(
+        [
+            {
+                "article_title": f"Title {i}",
+                "article_timestamp": f"2024-01-0{i + 1}T00:00:00",
+                "article_url": url,
+                "article_text": "Text",
+                "publish_location": "DC",
+                "statements": [
+                    {
+                        "attributed": candidate_name,
+                        "text": f"Statement {i}",
+                        "text_type": "quote",
+                        "classification": "Press Release",
+                    }
+                ],
+            }
+            for i, url in enumerate(urls)
+        ]
+    ).all
+
+
+@pytest.mark.parametrize("compression, suffix", [("", ".json"), ("gz", ".json.gz")])
+def test_load_candidates_over_a_pool(tmp_path, monkeypatch, compression, suffix):
+    monkeypatch.setenv("JSON_COMPRESSION", compression)
+    references = References(
+        NameMatcher(
+            [Candidate(1, 'Charles "Chuck" Schumer'), Candidate(2, "Tim Scott")],
+            workers=1,
+        ),
+        SPEECHTYPES,
+    )
+    urls = {
+        "9490": ["https://schumer.gov/1", "https://schumer.gov/2"],
+        "11940": ["https://scott.gov/1"],
+    }
+    candidate_inputs = {
+        "9490": (transformed("Chuck Schumer", urls["9490"]), Quarantine()),
+        "11940": (transformed("Tim Scott", urls["11940"]), Quarantine()),
+    }
+    pool = SQLitePool(tmp_path / "vsdb.db")
+    # Shared by the candidates, set to the roster once as main() does
+    name_cache = NameCache(tmp_path / "names.json")
+    name_cache.use_roster(references.fingerprint)
+
+    # Made by the earlier stages of the pipeline
+    for candidate_id in candidate_inputs:
+        (tmp_path / candidate_id).mkdir()
+
+    loaded = {
+        candidate_id: (harvest_file, loaded_urls)
+        for candidate_id, harvest_file, loaded_urls in load_candidates(
+            candidate_inputs, tmp_path, references, name_cache, pool, workers=2
+        )
+    }
+
+    assert loaded.keys() == urls.keys()
+    # One connection was held by every candidate, and given back
+    assert pool.opened == 2 and pool.in_use == 0
+    # The names of both candidates were resolved into the one cache
+    assert name_cache.fingerprint == references.fingerprint
+    assert len(name_cache.names) == 2 and name_cache.stats["misses"] == 2
+
+    for candidate_id, candidate in (("9490", 1), ("11940", 2)):
+        harvest_file, loaded_urls = loaded[candidate_id]
+        assert harvest_file.parent == tmp_path / candidate_id / "HARVEST_FILES"
+        assert harvest_file.name.endswith(suffix)
+        assert loaded_urls == urls[candidate_id]
+
+        harvest = list(JSONArrayReader(harvest_file, HarvestArticle))
+        assert [h.url for h in harvest] == urls[candidate_id]
+        assert {(*h.candidate_ids, h.speechtype_id) for h in harvest} == {
+            (candidate, 5)
+        }
@@ -0,0 +1,111 @@
+from collections import namedtuple
+
+import pytest
+
+from ps_pipeline.load.matcher import (
+    AMBIGUOUS,
+    MATCHED,
+    REVIEW,
+    NameMatcher,
+    normalize_name,
+)
+
+
+Candidate = namedtuple("Candidate", ["candidate_id", "candidate_name"])
+
+ROSTER = [
+    Candidate(1, 'Charles "Chuck" Schumer'),
+    Candidate(2, "Tim Scott"),
+    Candidate(3, "Rick Scott"),
+    Candidate(4, "Elizabeth Warren"),
+    Candidate(5, "Catherine Cortez Masto"),
+    Candidate(6, "Tim Kaine"),
+    Candidate(7, "Warren Davidson"),
+    Candidate(8, "Scott Peters"),
+]
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return NameMatcher(ROSTER, workers=1)
+
+
+@pytest.mark.parametrize(
+    "name, candidate_id, status, score",
+    [
+        ("Chuck Schumer", 1, MATCHED, 100.0),
+        ("Charles Schumer", 1, MATCHED, 100.0),
+        ("Tim Scott", 2, MATCHED, 100.0),
+        ("T. Scott", 2, MATCHED, 87.5),
+        ("Rick Scot", 3, MATCHED, 94.74),
+        ("Elizabeth Warren", 4, MATCHED, 100.0),
+        ("Elizabeth Warrn", 4, MATCHED, 96.77),
+        ("Cortez Masto", 5, MATCHED, 100.0),
+        ("Kathy Cortez Masto", 5, REVIEW, 80.0),
+        ("Timothy Kaine", 6, REVIEW, 81.82),
+    ],
+)
+def test_single_match(matcher, name, candidate_id, status, score):
+    (record,) = matcher.match([name])[name]
+
+    assert record["candidate_id"] == candidate_id
+    assert record["match_status"] == status
+    assert record["match_score"] == pytest.approx(score, abs=0.01)
+
+
+@pytest.mark.parametrize(
+    "name, candidate_ids",
+    [
+        # The shared token is a surname for one and a first name for the other
+        ("Warren", [4, 7]),
+        ("Scott", [2, 3, 8]),
+        ("Tim", [2, 6]),
+    ],
+)
+def test_ambiguous_match(matcher, name, candidate_ids):
+    records = matcher.match([name])[name]
+
+    assert [r["candidate_id"] for r in records] == candidate_ids
+    assert {r["match_status"] for r in records} == {AMBIGUOUS}
+
+
+@pytest.mark.parametrize("name", ["Chuck Shumer", "Liz Warren", "Senator Warren said"])
+def test_no_match(matcher, name):
+    assert name not in matcher.match([name])
+
+
+def test_blocks_on_every_token(matcher):
+    assert matcher.block(normalize_name("Warren")) == {3, 6}
+    assert matcher.block(normalize_name("T. Scott")) == {1, 2, 7}
+    assert matcher.block(normalize_name("Cortez Masto")) == {4}
+
+    # Misspelled names share no token, and fall back to the whole roster
+    assert matcher.block(normalize_name("Warrn")) == set()
+
+
+def test_blocked_as_exhaustive(matcher, monkeypatch):
+    names = [
+        "Warren",
+        "Scott",
+        "T. Scott",
+        "Sen. Scott Peters",
+        "Elizabeth Warrn",
+        "Timothy Kaine",
+        "Kathy Cortez Masto",
+        "Chuck Shumer",
+    ]
+    blocked = matcher.match(names)
+
+    # Every name scored against the whole roster
+    monkeypatch.setattr(matcher, "block", lambda name: frozenset())
+    assert matcher.match(names) == blocked
+
+
+def test_matches_in_bulk_as_one_by_one(matcher):
+    names = ["Chuck Schumer", "Scott", "Timothy Kaine", "Tim", "Liz Warren"]
+
+    assert matcher.match(names) == {
+        name: records
+        for name in names
+        for records in matcher.match([name]).values()
+    }
@@ -0,0 +1,153 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from selenium.common.exceptions import WebDriverException
+
+from ps_pipeline.extract.web.pipeline import pipelined_scrape
+from ps_pipeline.extract.web.retry import ARTICLE, LISTING, RetryQueue
+
+
+# Newest first, as listed. Aware and naive timestamps are mixed, as parsers
+# return the published_time meta when there is one and the page text otherwise
+PUBLISHED = {
+    "https://example.gov/5": "2024-01-05T12:00:00-05:00",
+    "https://example.gov/4": "January 4, 2024",
+    "https://example.gov/3": "2024-01-03T12:00:00+00:00",
+    "https://example.gov/2": "January 2, 2024",
+    "https://example.gov/1": "2024-01-01T12:00:00-05:00",
+}
+PAGES = [list(PUBLISHED)[:2], list(PUBLISHED)[2:]]
+
+
+class FakeSite:
+    """Fetches fake articles, failing the urls given as many times as given"""
+
+    def __init__(self, failures=None, error=WebDriverException):
+        self.failures = dict(failures or {})
+        self.error = error
+        self.fetched = []
+
+    def fetch_article(self, url):
+        self.fetched.append(url)
+        if self.failures.get(url):
+            self.failures[url] -= 1
+            raise self.error(f"Failed to load {url}")
+        return SimpleNamespace(url=url, timestamp=PUBLISHED[url])
+
+    def listing(self, report_error):
+        yield from PAGES
+
+
+@pytest.fixture
+def retry_queue():
+    queue = RetryQueue(max_attempts=2)
+    queue.backoff = lambda url: 0
+    return queue
+
+
+def scrape(site, retry_queue, last_collected=None, drivers=1):
+    saved = []
+    pipelined_scrape(
+        site.listing,
+        lambda driver, url: site.fetch_article(url),
+        saved.append,
+        [object() for _ in range(drivers)],
+        retry_queue,
+        last_collected,
+    )
+    return [article.url for article in saved]
+
+
+def test_scrapes_every_listed_article(retry_queue):
+    saved = scrape(FakeSite(), retry_queue, drivers=3)
+
+    assert sorted(saved) == sorted(PUBLISHED)
+    assert not retry_queue
+
+
+@pytest.mark.parametrize(
+    "last_collected",
+    [datetime(2024, 1, 3, 12), datetime(2024, 1, 3, 12, tzinfo=timezone.utc)],
+)
+def test_stops_at_last_collected(retry_queue, last_collected):
+    site = FakeSite()
+
+    saved = scrape(site, retry_queue, last_collected)
+
+    assert saved == ["https://example.gov/5", "https://example.gov/4"]
+    assert "https://example.gov/1" not in site.fetched
+
+
+def test_failed_articles_are_queued_and_retried(retry_queue):
+    site = FakeSite({"https://example.gov/4": 1})
+
+    saved = scrape(site, retry_queue)
+    assert "https://example.gov/4" not in saved
+    assert retry_queue.pending == {"https://example.gov/4": ARTICLE}
+
+    retried = retry_queue.drain(site.fetch_article, saved.append)
+    assert [a.url for a in retried] == ["https://example.gov/4"]
+    assert not retry_queue and not retry_queue.dead_letter
+
+
+def test_listing_errors_are_queued(retry_queue):
+    site = FakeSite()
+
+    def listing(report_error):
+        yield PAGES[0]
+        report_error("https://example.gov/page/2", WebDriverException("timeout"))
+
+    saved = []
+    pipelined_scrape(
+        listing,
+        lambda driver, url: site.fetch_article(url),
+        saved.append,
+        [object()],
+        retry_queue,
+    )
+
+    assert len(saved) == 2
+    assert retry_queue.pending == {"https://example.gov/page/2": LISTING}
+
+
+def test_worker_failure_is_raised(retry_queue):
+    site = FakeSite({"https://example.gov/3": 1}, error=KeyError)
+
+    with pytest.raises(KeyError):
+        scrape(site, retry_queue, drivers=2)
+
+
+def test_retried_listing_stops_at_last_collected(retry_queue):
+    site = FakeSite()
+    retry_queue.pending = {"https://example.gov/page/1": LISTING}
+    saved = []
+
+    retry_queue.drain(
+        site.fetch_article,
+        saved.append,
+        lambda url: list(PUBLISHED),
+        datetime(2024, 1, 3, 12, tzinfo=timezone.utc),
+    )
+
+    assert [a.url for a in saved] == ["https://example.gov/5", "https://example.gov/4"]
+    assert "https://example.gov/2" not in site.fetched
+
+
+def test_dead_letter_carried_over(retry_queue, tmp_path):
+    site = FakeSite({"https://example.gov/2": 2})
+    retry_queue.pending = {
+        "https://example.gov/2": ARTICLE,
+        # Paginated by clicking, so it cannot be revisited by url
+        "https://example.gov/page/3": LISTING,
+    }
+
+    assert retry_queue.drain(site.fetch_article, lambda article: None) == []
+    assert list(retry_queue.dead_letter) == ["https://example.gov/2"]
+
+    retry_path = tmp_path / "RETRY_FILES" / "dead_letter.json"
+    retry_queue.save(retry_path)
+
+    # Pages dead-lettered by the last run are retried with fresh attempts
+    loaded = RetryQueue.load(retry_path)
+    assert loaded.pending == {"https://example.gov/2": ARTICLE}
@@ -0,0 +1,141 @@
+from ps_pipeline.json_model import (
+    Article,
+    Articles,
+    HarvestArticle,
+    TransformedArticles,
+    json_files,
+)
+from ps_pipeline.store import ArticleStore
+
+
+CANDIDATE_ID = "9490"
+
+
+def make_store(tmp_path):
+    return ArticleStore(tmp_path / "pipeline.db")
+
+
+def test_articles_round_trip(tmp_path):
+    articles = [
+        Article.from_dict(
+            {
+                "title": f"Title {i}",
+                "source_url": f"https://example.gov/{i}",
+                "publish_time": f"2024-01-0{i}T00:00:00",
+                "raw_text": f"Text {i}",
+                "article_tags": ["tag"],
+            }
+        )
+        for i in (1, 2)
+    ]
+
+    with make_store(tmp_path) as store:
+        assert store.upsert_articles(CANDIDATE_ID, articles) == 2
+
+        stored = store.articles(CANDIDATE_ID).all
+        assert [a.url for a in stored] == [a.url for a in articles]
+        assert [a.text for a in stored] == ["Text 1", "Text 2"]
+        assert stored[0].tags == ["tag"]
+
+        assert store.urls(CANDIDATE_ID) == {a.url for a in articles}
+        assert store.latest(CANDIDATE_ID).day == 2
+        assert len(store.pending_transform(CANDIDATE_ID).all) == 2
+
+
+def test_transformed_round_trip(tmp_path):
+    transformed = TransformedArticles(
+        [
+            {
+                "article_title": "Title",
+                "article_timestamp": "2024-01-01T00:00:00",
+                "article_url": "https://example.gov/1",
+                "article_text": "Text",
+                "publish_location": "DC",
+                "statements": [
+                    {
+                        "attributed": "Chuck Schumer",
+                        "text": "A statement",
+                        "text_type": "quote",
+                        "classification": "Press Release",
+                    }
+                ],
+            }
+        ]
+    ).all
+
+    with make_store(tmp_path) as store:
+        assert store.upsert_transformed(CANDIDATE_ID, transformed) == 1
+
+        (pending,) = store.pending_load(CANDIDATE_ID).all
+        assert pending.url == "https://example.gov/1"
+        assert [s.attributed for s in pending.nlp_extracts.all] == ["Chuck Schumer"]
+
+        store.mark_loaded(CANDIDATE_ID, [pending.url])
+        assert store.pending_load(CANDIDATE_ID).all == []
+
+
+def test_harvest_round_trip_from_a_stream(tmp_path):
+    harvest = [
+        {
+            "candidate_ids": [1],
+            "speechtype_id": speechtype_id,
+            "title": "Title",
+            "speechdate": "2024-01-01",
+            "location": "DC",
+            "url": "https://example.gov/1",
+            "speechtext": "A statement",
+            "review": False,
+            "review_msg": None,
+        }
+        for speechtype_id in (5, 9)
+    ]
+
+    with make_store(tmp_path) as store:
+        # Harvest rows are streamed from the harvest file by the load stage
+        written = store.upsert_harvest(
+            CANDIDATE_ID, (HarvestArticle.from_dict(h) for h in harvest)
+        )
+        assert written == 2
+
+        stored = store.harvest(CANDIDATE_ID).all
+        assert sorted(h.speechtype_id for h in stored) == [5, 9]
+        assert all(h.candidate_ids == [1] and h.review is False for h in stored)
+
+
+def test_extract_files_imported_into_an_empty_store(tmp_path):
+    from ps_pipeline.extract.__main__ import import_extract_files
+
+    extract_path = tmp_path / "EXTRACT_FILES"
+    for version, published in enumerate(("2024-01-01", "2024-01-02")):
+        Articles(
+            [
+                {
+                    "title": "Title",
+                    "source_url": "https://example.gov/1",
+                    "publish_time": "2024-01-01T00:00:00",
+                    "raw_text": f"Version {version}",
+                },
+                {
+                    "title": "Title",
+                    "source_url": f"https://example.gov/{published}",
+                    "publish_time": f"{published}T00:00:00",
+                    "raw_text": "Text",
+                },
+            ]
+        ).save(filename="soup_0", export_path=extract_path)
+
+    with make_store(tmp_path) as store:
+        files = json_files(extract_path)
+        assert import_extract_files(store, CANDIDATE_ID, files) == 4
+
+        assert store.urls(CANDIDATE_ID) == {
+            "https://example.gov/1",
+            "https://example.gov/2024-01-01",
+            "https://example.gov/2024-01-02",
+        }
+        assert store.latest(CANDIDATE_ID).day == 2
+        # The article of the newest file wins
+        assert store.articles(CANDIDATE_ID).all[0].text == "Version 1"
+
+        # Only an empty store is imported into
+        assert import_extract_files(store, CANDIDATE_ID, files) == 0
@@ -5,15 +5,15 @@ Main module that executes the transformation pipeline on command.
 __author__ = "Johanan Tai"
 
 import argparse
-import json
 import os
 
 from pathlib import Path
 from dotenv import load_dotenv
-from tqdm import tqdm
 
-from ps_pipeline.transform import pipe
-from ps_pipeline.json_model import Articles, TransformedArticles
+from ps_pipeline.json_model import Article, TransformedArticles, json_files
+from ps_pipeline.json_reader import JSONArrayReader
+from ps_pipeline.schema import Quarantine
+from ps_pipeline.store import open_store
 
 
 """
@@ -66,30 +66,50 @@ def main():
 
     args = parser.parse_args()
 
+    # spaCy and the models are only imported once there is work to do
+    from tqdm import tqdm
+    from ps_pipeline.transform import pipe
+
     data_directory = Path(os.getenv("DATA_FILES_DIRECTORY"))
     extract_path = data_directory / args.candidate_id / "EXTRACT_FILES"
     transformed_path = data_directory / args.candidate_id / "TRANSFORMED_FILES"
     
-    if args.filepath is None:
-        extract_files = filter(lambda f: f.name.endswith(".json"), extract_path.iterdir())
-        sorted_extract_files = sorted(
-        extract_files, key=lambda x: x.stat().st_mtime, reverse=True
+    quarantine_path = data_directory / args.candidate_id / "QUARANTINE_FILES"
+
+    store = open_store()
+    # Articles that would fail halfway through the transform are set aside
+    quarantine = Quarantine()
+
+    if args.filepath is None and store is not None:
+        # Only the articles that are new or changed since the last transform
+        articles = list(
+            quarantine.filter(store.pending_transform(args.candidate_id).all, Article)
         )
-        with open(sorted_extract_files[0], "r") as f:
-            json_articles = Articles(json.load(f))
-    else:
-        if not args.filepath.exists():
-            print("Cannot find extract file.")
-            exit()
+        articles = articles[: args.articles_n] if args.articles_n else articles
 
-        with open(args.filepath, "r") as f:
-            json_articles = Articles(json.load(f))
+    else:
+        if args.filepath is None:
+            extract_file = json_files(extract_path)[-1]
+        else:
+            if not args.filepath.exists():
+                print("Cannot find extract file.")
+                exit()
+
+            extract_file = args.filepath
+
+        # Only the articles to be processed are parsed
+        json_articles = JSONArrayReader(extract_file, Article, quarantine=quarantine)
+        articles = (
+            json_articles.select(args.articles_n)
+            if args.articles_n
+            else list(json_articles)
+        )
 
-    articles = (
-        json_articles.all[:args.articles_n]
-        if args.articles_n
-        else json_articles.all
-    )
+    if quarantine:
+        print(
+            f"{len(quarantine)} invalid articles quarantined to",
+            quarantine.save(quarantine_path, "Article"),
+        )
 
     progress_bar = tqdm(total=len(articles), desc="Processing")
 
@@ -98,8 +118,14 @@ def main():
         transformed_data.append(transformed_article)
         progress_bar.update(1)
 
-    
-    TransformedArticles(transformed_data).save(transformed_path)
+    transformed_articles = TransformedArticles(transformed_data)
+    transformed_articles.save(
+        transformed_path, compact=True, compression=os.getenv("JSON_COMPRESSION")
+    )
+
+    if store is not None:
+        store.upsert_transformed(args.candidate_id, transformed_articles.all)
+        store.close()
 
 
 if __name__ == "__main__":
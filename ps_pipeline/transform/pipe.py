@@ -4,10 +4,6 @@ General logic for the loading pipeline, matching persons and harvest file creati
 
 __author__ = "Johanan Tai"
 
-import re
-from datetime import datetime
-from dateutil.parser import parse as datetimeparse
-
 # External packages and libraries
 import spacy
 from unidecode import unidecode as asciify
@@ -17,44 +13,10 @@ from ps_pipeline.transform.nlp import (
     articles as nlp_articles,
 )
 from ps_pipeline.json_model import Articles
+from ps_pipeline.dates import find_date, parse as datetimeparse, source_of
 
-
-datetime_ISO = re.compile(
-    r"^\d{4}-\d{2}-\d{2}(?:T\d{2}:\d{2}:\d{2}(?:[\-\+]\d{2}:\d{2}|Z)?)?$"
-)
-mm_dd_yyyy = re.compile(r"(?P<m>\d{2})[\/|-|\.](?P<d>\d{2})[\/|-|\.](?P<Y>\d{4})")
-mm_dd_yy = re.compile(r"(?P<m>\d{2})[\/|-|\.](?P<d>\d{2})[\/|-|\.](?P<y>\d{2})")
-month_dd_yyyy = re.compile(
-    r"(?P<B>[A-Za-z]{4,})\s+(?P<d>\d{2})(?:,\s*|\s+)(?P<Y>\d{4})"
-)
-smonth_dd_yyyy = re.compile(
-    r"(?P<b>[A-Za-z]{3})\s+(?P<d>\d{2})(?:,\s*|\s+)(?P<Y>\d{4})"
-)
-
-
-def transform_date(text):
-
-    patterns = {
-        0: datetime_ISO,
-        1: mm_dd_yyyy,
-        2: mm_dd_yy,
-        3: month_dd_yyyy,
-        4: smonth_dd_yyyy,
-    }
-    # use finditer for date since they might be embedded within text
-
-    for i, p in patterns.items():
-        matched = list(p.finditer(text))
-        for result in matched:
-            if i == 0 and p.fullmatch(text):
-                return str(datetime.fromisoformat(text))
-            else:
-                d = result.groupdict()
-                params = " ".join([f"%{k}" for k in d if d[k]])
-                values = " ".join([v for v in d.values() if v])
-                return str(datetime.strptime(values, params))
-
-    return text
+# Kept importable under its old name
+transform_date = find_date
 
 
 def replace_str_by_position(original, replacements: list[tuple[tuple[int, int], str]]):
@@ -135,7 +97,9 @@ def transform_json(articles: Articles):
         data = {
             # Unidecode asciifies the text
             "article_title": asciify(article.title),
-            "article_timestamp": str(datetimeparse(article.timestamp)),
+            "article_timestamp": str(
+                datetimeparse(article.timestamp, source_of(article.url))
+            ),
             "article_url": article.url,
             "article_text": asciified_text,
             "publish_location": (